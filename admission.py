@@ -0,0 +1,142 @@
+# --- START OF FILE admission.py ---
+# Admission control for requests that call the model. Each request takes a token from its
+# user's bucket and from one global bucket. The buckets live in a small SQLite file, so
+# every gunicorn worker on the host shares them.
+#
+# The global bucket may go negative: a negative balance is the wait queue. A request that
+# reserves a token below zero sleeps until its turn, so its depth is simply -balance.
+# How deep a request may queue depends on its priority, so chatbot help is shed with a
+# 429 while answer grading is still being queued.
+
+import logging
+import math
+import os
+import sqlite3
+import tempfile
+import time
+
+import metrics
+from sqlite_local import LocalConnection
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+ADMISSION_DB_PATH = os.environ.get('ADMISSION_DB_PATH', os.path.join(tempfile.gettempdir(), 'quiz_admission.sqlite3'))
+ADMISSION_USER_RATE = float(os.environ.get('ADMISSION_USER_RATE', 0.5))     # tokens/second per user
+ADMISSION_USER_BURST = float(os.environ.get('ADMISSION_USER_BURST', 5))
+ADMISSION_GLOBAL_RATE = float(os.environ.get('ADMISSION_GLOBAL_RATE', 10))  # tokens/second for the host
+ADMISSION_GLOBAL_BURST = float(os.environ.get('ADMISSION_GLOBAL_BURST', 20))
+ADMISSION_QUEUE_MAX = float(os.environ.get('ADMISSION_QUEUE_MAX', 50))      # queued requests, all workers
+ADMISSION_MAX_WAIT_SECONDS = float(os.environ.get('ADMISSION_MAX_WAIT_SECONDS', 5))
+ADMISSION_IDLE_USER_SECONDS = 3600 # Full user buckets older than this are pruned
+
+# Share of the wait queue each priority may use; a smaller share is shed sooner
+PRIORITY_QUEUE_SHARE = {"grading": 1.0, "game": 0.5, "help": 0.25}
+GLOBAL_KEY = "global"
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed; retry_after is a whole number of seconds."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Request shed ({reason}); retry after {retry_after}s.")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Per-user and global token buckets shared across workers through SQLite.
+
+    admit() returns once the request may proceed (after waiting in the queue if needed)
+    or raises AdmissionRejected. Storage errors fail open so a broken file never blocks play.
+    """
+
+    def __init__(self, path=ADMISSION_DB_PATH):
+        self.path = path
+        self._connect = LocalConnection(path, timeout=5)
+        self._ops = 0
+        self._ensure_schema()
+
+    def _ensure_schema(self):
+        self._connect().execute(
+            'CREATE TABLE IF NOT EXISTS buckets ('
+            ' key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)'
+        )
+
+    @staticmethod
+    def _level(conn, key, rate, burst, now):
+        row = conn.execute('SELECT tokens, updated_at FROM buckets WHERE key = ?', (key,)).fetchone()
+        if row is None: return burst
+        return min(burst, row[0] + max(0.0, now - row[1]) * rate)
+
+    def _queue_floor(self, priority):
+        share = PRIORITY_QUEUE_SHARE.get(priority, min(PRIORITY_QUEUE_SHARE.values()))
+        return -min(ADMISSION_QUEUE_MAX * share, ADMISSION_MAX_WAIT_SECONDS * ADMISSION_GLOBAL_RATE)
+
+    def _reserve(self, user_key, priority, cost):
+        """Takes the tokens in one transaction; returns seconds to wait before proceeding"""
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            user_tokens = self._level(conn, "user:" + user_key, ADMISSION_USER_RATE, ADMISSION_USER_BURST, now)
+            if user_tokens < 1:
+                raise AdmissionRejected("user", math.ceil((1 - user_tokens) / ADMISSION_USER_RATE))
+            global_after = self._level(conn, GLOBAL_KEY, ADMISSION_GLOBAL_RATE, ADMISSION_GLOBAL_BURST, now) - cost
+            floor = self._queue_floor(priority)
+            if global_after < floor:
+                raise AdmissionRejected("global", max(1, math.ceil((floor - global_after) / ADMISSION_GLOBAL_RATE)))
+            conn.executemany('INSERT OR REPLACE INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?)',
+                             [("user:" + user_key, user_tokens - 1, now), (GLOBAL_KEY, global_after, now)])
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        self._ops += 1
+        if self._ops % 500 == 0: self._prune(now)
+        return max(0.0, -global_after) / ADMISSION_GLOBAL_RATE
+
+    def _prune(self, now):
+        # An idle user's bucket is full again, so dropping the row changes nothing
+        try:
+            self._connect().execute('DELETE FROM buckets WHERE key != ? AND updated_at < ?',
+                                    (GLOBAL_KEY, now - ADMISSION_IDLE_USER_SECONDS))
+        except sqlite3.Error as e:
+            logger.warning("admission prune failed", extra={"error": str(e)})
+
+    def admit(self, user_key, priority, cost=1):
+        """Blocks until the request is admitted; raises AdmissionRejected when it is shed.
+
+        cost is charged to the global bucket (e.g. one per model call a request makes);
+        the user's bucket is always charged one token per request.
+        """
+        try:
+            wait = self._reserve(str(user_key), priority, cost)
+        except AdmissionRejected as e:
+            metrics.inc("admission_requests_total", priority=priority, outcome=f"shed_{e.reason}")
+            raise
+        except sqlite3.Error as e:
+            logger.warning("admission check failed; admitting", extra={"error": str(e)})
+            return 0.0
+        metrics.inc("admission_requests_total", priority=priority, outcome="queued" if wait else "admitted")
+        if wait:
+            metrics.observe("admission_wait_seconds", wait, priority=priority)
+            time.sleep(wait)
+        return wait
+
+    def queue_depth(self):
+        """Tokens currently reserved ahead of the refill, i.e. requests waiting across all workers"""
+        try:
+            level = self._level(self._connect(), GLOBAL_KEY, ADMISSION_GLOBAL_RATE, ADMISSION_GLOBAL_BURST, time.time())
+        except sqlite3.Error:
+            return 0.0
+        return max(0.0, -level)
+
+    def snapshot(self):
+        return {
+            "queue_depth": round(self.queue_depth(), 2), "queue_max": ADMISSION_QUEUE_MAX,
+            "global_rate": ADMISSION_GLOBAL_RATE, "user_rate": ADMISSION_USER_RATE,
+            "queue_limits": {p: -self._queue_floor(p) for p in PRIORITY_QUEUE_SHARE},
+        }
+
+# --- END OF FILE admission.py ---
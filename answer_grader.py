@@ -0,0 +1,117 @@
+# --- START OF FILE answer_grader.py ---
+
+import re
+import threading
+
+import metrics
+
+# --- Thresholds ---
+# Only answers that obviously equal an accepted answer are marked correct here: the same
+# tokens (filler words aside), or the same tokens with small per-word typos. Anything that
+# adds words goes to the quiz model, since one extra word ("not", "reduced") can flip the meaning.
+TYPO_MIN_LENGTH = 8           # Shorter words must match exactly ("GenCat" is not "GenCast")
+TYPO_MAX_RATIO = 0.2          # Allowed edit distance per word, as a fraction of its length
+TYPO_MAX_EDITS = 2
+WRONG_MAX_SIMILARITY = 0.34   # Below this (and no shared tokens) an answer is clearly wrong
+
+STOPWORDS = {"a", "an", "the", "is", "it", "its", "of", "and", "or", "to", "in", "on", "for", "by", "i", "think", "maybe", "ai"}
+# Words and prefixes that negate or weaken an answer; never accepted locally unless the accepted answer has them too
+NEGATIONS = {"no", "not", "non", "never", "none", "nor", "without", "isnt", "dont", "cannot", "cant", "less", "lack",
+             "lacking", "reduced", "reduce", "decreased", "decrease", "lower", "lowered", "worse", "anti", "un"}
+NEGATING_PREFIXES = ("un", "non", "in", "im", "il", "ir", "dis", "de", "anti", "mis")
+
+
+def _tokens(text):
+    return [t for t in re.findall(r'[a-z0-9]+', (text or '').casefold()) if t not in STOPWORDS]
+
+def _compact(text):
+    """Lowercase alphanumerics only, so 'DALL-E', 'dall e' and 'Dall.E' compare equal"""
+    return re.sub(r'[^a-z0-9]', '', (text or '').casefold())
+
+def _is_typo(user_token, answer_token):
+    """True for a small misspelling of answer_token that doesn't turn it into its opposite"""
+    if user_token == answer_token: return True
+    if len(answer_token) < TYPO_MIN_LENGTH: return False
+    allowed = min(TYPO_MAX_EDITS, int(len(answer_token) * TYPO_MAX_RATIO))
+    if edit_distance(user_token, answer_token) > allowed: return False
+    # "unexplainable" is two edits from "explainable", but it is not a typo of it
+    return not any(user_token.startswith(p) and not answer_token.startswith(p)
+                   and edit_distance(user_token[len(p):], answer_token) <= allowed for p in NEGATING_PREFIXES)
+
+def edit_distance(a, b):
+    """Levenshtein distance between two strings"""
+    if len(a) < len(b): a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+class AnswerGrader:
+    """Deterministic first-pass grader that resolves clearly right/wrong answers locally.
+
+    grade() returns (is_correct, feedback) or None when the answer needs the model.
+    Per-stage counters are kept so we can see how much traffic each stage absorbs.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stage_counts = {"exact": 0, "alias": 0, "typo": 0, "token_overlap": 0, "clearly_wrong": 0, "ambiguous": 0}
+
+    def _count(self, stage):
+        with self._lock:
+            self.stage_counts[stage] += 1
+        metrics.inc("answer_grader_resolutions_total", stage=stage)
+
+    def grade(self, question_obj, user_answer):
+        correct_answer = question_obj["answer"]
+        accepted = [correct_answer] + list(question_obj.get("aliases", []))
+        user_compact = _compact(user_answer)
+        if not user_compact:
+            return None
+
+        # Stage 1: normalized exact match against the answer or an alias
+        if user_compact == _compact(correct_answer):
+            self._count("exact")
+            return True, "Correct!"
+        if any(user_compact == _compact(alias) for alias in accepted[1:]):
+            self._count("alias")
+            return True, "Correct!"
+
+        user_token_list = _tokens(user_answer)
+        user_tokens = set(user_token_list)
+        best_similarity = 0.0
+        shared_any = False
+        for candidate in accepted:
+            cand_compact = _compact(candidate)
+            longest = max(len(user_compact), len(cand_compact))
+            best_similarity = max(best_similarity, 1 - edit_distance(user_compact, cand_compact) / longest)
+            cand_token_list = _tokens(candidate)
+            cand_tokens = set(cand_token_list)
+            if not cand_tokens: continue
+            shared_any = shared_any or bool(user_tokens & cand_tokens)
+            if (user_tokens & NEGATIONS) - cand_tokens: continue
+
+            # Stage 2: the same words in any order, ignoring filler ("it is bias")
+            if user_tokens == cand_tokens:
+                self._count("token_overlap")
+                return True, "Correct!"
+
+            # Stage 3: the same words in the same order, some slightly misspelled
+            if len(user_token_list) == len(cand_token_list) and all(map(_is_typo, user_token_list, cand_token_list)):
+                self._count("typo")
+                return True, f"Correct [spelling error, Correct spelling: '{correct_answer}']"
+
+        # Stage 4: nothing in common with any accepted answer -> clearly wrong
+        if not shared_any and best_similarity < WRONG_MAX_SIMILARITY:
+            self._count("clearly_wrong")
+            explanation = question_obj.get("hint", "")
+            return False, f"Incorrect. The correct answer is: '{correct_answer}'. {explanation}".strip()
+
+        self._count("ambiguous")
+        return None
+
+# --- END OF FILE answer_grader.py ---
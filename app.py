@@ -1,121 +1,165 @@
 # --- START OF FILE app.py ---
 
-from flask import Flask, jsonify, render_template, request, session, url_for
-import google.generativeai as genai
+from flask import Flask, Response, g, jsonify, render_template, request, session, url_for
+from werkzeug.middleware.proxy_fix import ProxyFix
+import hashlib
+import hmac
+import json
+import logging
+import math
+import time
 import random
 import os
 import uuid
+from verdict_cache import VerdictCache, normalize_answer
+from answer_grader import AnswerGrader
+from batch_grader import MicroBatcher, grade_batch, BATCH_MAX_ITEMS
+from admission import AdmissionController, AdmissionRejected
+from progress_store import ProgressStore
+from help_cache import HelpCache
+from model_calls import call_model, stream_model, inflight_count, MAX_INFLIGHT_MODEL_CALLS
+import quiz_state as qs
+from question_bank import QuestionBank
+from prompt_similarity import PromptSimilarity, explain_rating
+import prompts
+from game_content import load_game_content
+from model_client import ModelClient
+from app_logging import configure_logging
+import metrics
+import assets
+
+configure_logging()
+logger = logging.getLogger('app')
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
 # IMPORTANT: Set a strong secret key in production!
 app.secret_key = os.environ.get('SECRET_KEY', 'a-very-secure-dev-secret-key-CHANGE-ME')
+# Hashed, pre-compressed static files from build_assets.py (falls back to static/ as-is)
+assets.init_app(app)
+# Behind a load balancer (e.g. Heroku's router, 1 hop) take the client address from X-Forwarded-For
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 0))
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS, x_proto=TRUSTED_PROXY_HOPS)
 
 # --- Data Definitions ---
-questions_data_original = [
-    {"id": 1, "question": "What is the primary advantage of Human-AI collaboration?", "answer": "Enhanced Productivity", "hint": "Think about how combining human intuition with AI capabilities improves work outcomes."},
-    {"id": 2, "question": "Which neural network model is designed to mimic human brain functions?", "answer": "Spiking Neural Network", "hint": "This model simulates the electrical impulses (spikes) that neurons use to communicate."},
-    {"id": 3, "question": "What is a key ethical concern in AI decision-making?", "answer": "Bias", "hint": "This issue occurs when AI systems reflect or amplify unfair human prejudices."},
-    {"id": 4, "question": "Which AI-powered tool is commonly used in mental health therapy?", "answer": "Woebot", "hint": "This chatbot was developed at Stanford to deliver cognitive-behavioral therapy techniques."},
-    {"id": 5, "question": "Which AI-driven model helps in predicting extreme weather conditions?", "answer": "GenCast", "hint": "This system uses generative AI to predict weather patterns with higher accuracy."},
-    {"id": 6, "question": "Which AI-based system is used for fraud detection in banking?", "answer": "Machine Learning", "hint": "This technology can analyze patterns in transactions to identify suspicious activities."},
-    {"id": 7, "question": "What AI technology is used to create digital artwork?", "answer": "DALL-E", "hint": "This OpenAI system can generate images from textual descriptions."},
-    {"id": 8, "question": "Which AI-based chatbot helps in personalized learning for students?", "answer": "Squirrel AI", "hint": "This adaptive learning platform is popular in Asian countries for providing customized education."},
-    {"id": 9, "question": "What is the term for AI models that provide justifications for their decisions?", "answer": "Explainable AI", "hint": "This concept focuses on making AI decision-making processes transparent and understandable."},
-    {"id": 10, "question": "What is the AI-driven concept where machines surpass human intelligence?", "answer": "Singularity", "hint": "This theoretical point refers to when AI becomes capable of recursive self-improvement."}
-]
-
-prompt_game_data = [
-    { "id": "g1", "type": "text", "original_prompt": "Write a short poem about a robot learning to dream.", "output": "Steel gears turn soft tonight,\nCircuits hum a gentle light.\nBinary code begins to fray,\nAs electric sheep drift away.\nA new world blooms behind closed eyes,\nWhere logic fades and wonder flies." },
-    { "id": "g2", "type": "text", "original_prompt": "Describe a futuristic city powered entirely by bioluminescent algae.", "output": "Towers pulsed with a soft, green glow, mirroring the canals below where shimmering algae flowed. Buildings resembled giant coral structures, interconnected by bridges woven from living light. Air-taxis, silent as moths, navigated the glowing pathways, their forms silhouetted against the luminous haze." },
-    { "id": "g3", "type": "text", "original_prompt": "Explain the concept of a 'digital twin' in simple terms.", "output": "Imagine a perfect virtual copy of a real-world object, like a jet engine or even a whole factory. This 'digital twin' gets real-time data from its physical counterpart. You can test changes, predict problems, or optimize performance on the twin without affecting the real thing." },
-    { "id": "g4", "type": "text", "original_prompt": "Create a recipe for a pizza inspired by the planet Mars.", "output": "Martian Crater Pizza:\nBase: Thin crust, perhaps with red pepper flakes for 'rust'.\nSauce: Spicy arrabiata sauce.\nToppings: Black olives ('craters'), sun-dried tomatoes ('red rocks'), feta cheese ('ice caps'), scattered basil ('potential life'). Bake until crust is crisp and cheese is bubbly." }
-]
+# Quiz questions live in a file-backed bank (see question_bank.py / data/questions.jsonl)
+question_bank = QuestionBank()
+
+# Game items are pre-generated offline (generate_game_content.py) and loaded once here
+prompt_game_data = load_game_content()
+game_content_by_id = {item["id"]: item for item in prompt_game_data}
+
+# Precomputed TF-IDF vectors of the original prompts for local guess scoring
+prompt_similarity = PromptSimilarity({item["id"]: item["original_prompt"] for item in prompt_game_data})
+MAX_SIMILARITY_BATCH = 1000
+MAX_EXAM_ANSWERS = 200
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN') # Unset disables the /api/admin routes
 
 # --- Model Configuration ---
 # Make sure GOOGLE_API_KEY is set!
+# Models are created lazily on first use (see model_client.py); each role lists its
+# primary model first, then fallbacks used while the primary's circuit breaker is open.
+# Each task gets its own client so its fixed instructions and output schema are set once
+# on the model (see prompts.py); grading and help share the quiz model names.
 api_key = os.environ.get('GOOGLE_API_KEY')
+quiz_model_names = os.environ.get('QUIZ_MODELS', 'gemini-2.0-flash-lite,gemini-2.0-flash').split(',')
+game_model_names = os.environ.get('GAME_MODELS', 'gemini-2.0-flash,gemini-2.0-flash-lite').split(',')
 quiz_model = None
+help_model = None
 game_model = None
 model_init_error = None
 
 if not api_key:
     model_init_error = "GOOGLE_API_KEY environment variable not set."
-    print(f"ERROR: {model_init_error}")
+    logger.error("model configuration failed", extra={"error": model_init_error})
 else:
-    try:
-        genai.configure(api_key=api_key)
-
-        # --- Initialize Quiz Model (e.g., Flash for speed/cost) ---
-        try:
-            quiz_model_name = 'gemini-2.0-flash-lite'
-            quiz_model = genai.GenerativeModel(quiz_model_name)
-            # Quick test (optional, adds startup time)
-            # quiz_model.generate_content("test quiz model")
-            print(f"Quiz Model loaded: {quiz_model_name}")
-        except Exception as e_quiz:
-            print(f"Warning: Could not load primary quiz model ({quiz_model_name}): {e_quiz}. Trying fallback...")
-            try:
-                quiz_model_name = 'gemini-2.0-flash' # Fallback
-                quiz_model = genai.GenerativeModel(quiz_model_name)
-                print(f"Quiz Model loaded: {quiz_model_name} (fallback)")
-            except Exception as e_quiz_fallback:
-                 model_init_error = f"Failed to initialize any quiz model: {e_quiz_fallback}"
-                 print(f"ERROR: {model_init_error}")
-
-
-        # --- Initialize Game Model (e.g., Pro for better comparison, or same as quiz) ---
-        try:
-            # Change this if you want a different model for the game
-            game_model_name = 'gemini-2.0-flash'
-            # game_model_name = 'gemini-1.5-pro-latest' # Example of using a potentially better model
-            game_model = genai.GenerativeModel(game_model_name)
-            # Quick test (optional)
-            # game_model.generate_content("test game model")
-            print(f"Game Model loaded: {game_model_name}")
-        except Exception as e_game:
-            print(f"Warning: Could not load primary game model ({game_model_name}): {e_game}. Trying fallback...")
-            try:
-                game_model_name = 'gemini-2.0-flash-lite' # Fallback
-                game_model = genai.GenerativeModel(game_model_name)
-                print(f"Game Model loaded: {game_model_name} (fallback)")
-            except Exception as e_game_fallback:
-                # If game model fails but quiz model worked, maybe default game model to quiz model?
-                if quiz_model:
-                    game_model = quiz_model
-                    print(f"Warning: Game model failed, using quiz model ({quiz_model_name}) as fallback for game.")
-                else:
-                    err_msg = f"Failed to initialize any game model: {e_game_fallback}"
-                    if model_init_error: model_init_error += f"; {err_msg}"
-                    else: model_init_error = err_msg
-                    print(f"ERROR: {err_msg}")
-
-    except Exception as e_configure:
-        model_init_error = f"Failed to configure GenerativeAI: {e_configure}"
-        print(f"ERROR: {model_init_error}")
+    quiz_model = ModelClient('quiz', quiz_model_names, api_key, **prompts.GRADING_MODEL_CONFIG)
+    help_model = ModelClient('help', quiz_model_names, api_key, **prompts.HELP_MODEL_CONFIG)
+    game_model = ModelClient('game', game_model_names, api_key, **prompts.GUESS_MODEL_CONFIG)
+
+def warm_up_models(send_request=False):
+    """Optional warm-up (e.g. from gunicorn's post_fork hook) so the first request doesn't pay model setup"""
+    for client in (quiz_model, help_model, game_model):
+        if client: client.warm_up(send_request=send_request)
+
+# --- Verdict Cache ---
+# Shared across workers; lets repeat answers skip the quiz model round-trip.
+verdict_cache = VerdictCache()
+# Local first-pass grading; only ambiguous answers reach the quiz model.
+answer_grader = AnswerGrader()
+# Answers that do reach the model are graded in small batches (see batch_grader.py)
+answer_batcher = MicroBatcher(quiz_model) if quiz_model else None
+
+# --- Admission Control ---
+# Shared per-user and global token buckets in front of every model call (see admission.py)
+admission = AdmissionController()
+metrics.gauge("admission_queue_depth", admission.queue_depth)
+
+# --- Progress Store ---
+# Every graded attempt is persisted per user (write-behind, off the request path); the
+# leaderboard and per-question accuracy are served from in-memory aggregates.
+progress_store = ProgressStore()
+
+# --- Help Cache ---
+# Chatbot replies are reused for similar help requests on the same question (see help_cache.py)
+help_cache = HelpCache()
 
 # --- Helper Functions ---
-def initialize_quiz_session():
-    """Initialize/ensure quiz session variables"""
+def ensure_user_id():
+    """Gives the browser session a stable id (per-user admission buckets, progress)"""
     if 'user_id' not in session:
         session['user_id'] = str(uuid.uuid4())
-    if 'quiz_state' not in session:
-        questions = questions_data_original.copy()
-        random.shuffle(questions)
-        session['quiz_state'] = {
-            'questions': questions, 'current_question_index': 0,
-            'answered_questions': [], 'correct_answers': 0, 'total_attempts': 0
-        }
-    # Ensure essential keys exist
-    state = session['quiz_state']
-    state.setdefault('questions', questions_data_original.copy())
-    state.setdefault('current_question_index', 0)
-    state.setdefault('answered_questions', [])
-    state.setdefault('correct_answers', 0)
-    state.setdefault('total_attempts', 0)
-    if not state['questions']: # Reset if list became empty
-         questions = questions_data_original.copy(); random.shuffle(questions)
-         state['questions'] = questions; state['current_question_index'] = 0
-    return state
+    return session['user_id']
+
+def initialize_quiz_session():
+    """Initialize/ensure quiz session variables"""
+    ensure_user_id()
+    if not qs.is_compact_state(session.get('quiz_state')): # Missing or pre-compact cookie
+        session['quiz_state'] = qs.new_quiz_state()
+    return session['quiz_state']
+
+def quiz_filters(quiz_state):
+    """Category/difficulty filters chosen for this session (None = whole bank)"""
+    return {"category": quiz_state.get('category'), "difficulty": quiz_state.get('difficulty')}
+
+def quiz_size(quiz_state):
+    """Size of this session's shuffled order, fixed when the quiz starts.
+
+    The order is a permutation of that many pool positions, so it survives the bank
+    growing (new questions are appended and join at the next reset). If the pool shrinks
+    below it, the order is restarted; score counters are kept.
+    """
+    current = question_bank.pool_size(**quiz_filters(quiz_state))
+    size = quiz_state.get('pool_size')
+    if size is not None and size <= current: return size
+    if size is not None:
+        logger.info("question pool shrank; restarting quiz order", extra={"was": size, "now": current})
+        restarted = qs.new_quiz_state()
+        for key in ('seed', 'index', 'answered_runs', 'completed'): quiz_state[key] = restarted[key]
+    quiz_state['pool_size'] = current
+    session.modified = True
+    return current
+
+def question_at(quiz_state, index):
+    """Resolves the question shown at `index` in this session's shuffled order"""
+    position = qs.permuted_position(quiz_state['seed'], index, quiz_size(quiz_state))
+    return question_bank.question_in_pool(position, **quiz_filters(quiz_state))
+
+def session_position(quiz_state, question_id):
+    """Inverse of question_at: where a question sits in this session's order (None if not in it)"""
+    pool_position = question_bank.pool_position_of(question_id, **quiz_filters(quiz_state))
+    size = quiz_size(quiz_state)
+    if pool_position is None or pool_position >= size: return None # Added after this quiz started
+    return qs.original_position(quiz_state['seed'], pool_position, size)
+
+def quiz_progress(quiz_state):
+    """Progress counters returned by the quiz API routes"""
+    return {
+        "completed_questions": qs.answered_count(quiz_state),
+        "total_questions": quiz_size(quiz_state),
+        "correct_answers": quiz_state.get('correct_answers', 0),
+        "total_attempts": quiz_state.get('total_attempts', 0)
+    }
 
 def check_model(model_instance, feature_name):
     """Checks if a model is available, returns error response if not"""
@@ -123,8 +167,58 @@ def check_model(model_instance, feature_name):
          return jsonify({"error": f"AI Model Configuration Error: {model_init_error}"}), 503
     if not model_instance:
         return jsonify({"error": f"The AI model required for {feature_name} is not available."}), 503
+    if not model_instance.available(): # Every breaker open: fail fast instead of waiting on upstream
+        return jsonify({"error": f"The AI model required for {feature_name} is temporarily unavailable. Please try again shortly."}), 503
     return None # Indicates model is okay
 
+def admission_key():
+    # Ids are issued by page/content routes, never here, so a client that drops its cookie
+    # falls back to its address instead of getting a fresh bucket per request
+    return session.get('user_id') or request.remote_addr or 'anonymous'
+
+def shed_response(rejection):
+    """429 with Retry-After for a request turned away by admission control"""
+    message = ("You're sending requests too quickly. Please wait a moment." if rejection.reason == "user"
+               else "The AI service is busy right now. Please try again shortly.")
+    response = jsonify({"error": message, "retry_after": rejection.retry_after})
+    response.headers['Retry-After'] = str(rejection.retry_after)
+    return response, 429
+
+def check_admin():
+    """Returns a 403 response unless the request carries `Authorization: Bearer <ADMIN_TOKEN>`"""
+    scheme, _, supplied = request.headers.get('Authorization', '').partition(' ')
+    if not ADMIN_TOKEN or scheme != 'Bearer' or not hmac.compare_digest(supplied.strip().encode(), ADMIN_TOKEN.encode()):
+        return jsonify({"error": "Not authorized."}), 403
+    return None # Authorized
+
+def check_admission(priority, cost=1):
+    """Waits for an admission token; returns a 429 response if the request is shed"""
+    try:
+        admission.admit(admission_key(), priority, cost)
+    except AdmissionRejected as e:
+        return shed_response(e)
+    return None # Admitted
+
+
+# --- Instrumentation ---
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    # Label by URL rule (not raw path) so ids in URLs don't explode the series count
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    elapsed = time.perf_counter() - g.get('request_started', time.perf_counter())
+    metrics.inc("http_requests_total", route=route, method=request.method, status=response.status_code)
+    metrics.observe("http_request_duration_seconds", elapsed, route=route, method=request.method)
+    return response
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint, aggregated across all workers on this host."""
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 
 # --- Page Routes ---
 @app.route('/')
@@ -141,6 +235,7 @@ def quiz_page():
 @app.route('/game')
 def game_page():
     """Renders the Guess the Prompt game page."""
+    ensure_user_id()
     return render_template('guess_prompt_game.html')
 
 
@@ -158,49 +253,43 @@ def get_question():
     # If this request IS for the next question, increment BEFORE getting the index
     # Otherwise, use the index as is (for initial load or refresh)
     if is_requesting_next:
-        quiz_state['current_question_index'] = quiz_state.get('current_question_index', 0) + 1
+        quiz_state['index'] = quiz_state.get('index', 0) + 1
         session.modified = True # Mark session modified because index changed
-        print(f"Incrementing index for 'next' request. New index: {quiz_state['current_question_index']}")
+        logger.debug("advancing to next question", extra={"index": quiz_state['index']})
 
-    current_index = quiz_state.get('current_question_index', 0)
+    size = quiz_size(quiz_state) # May restart the order (and index) if the pool shrank
+    current_index = quiz_state.get('index', 0)
 
-    # Handle cycling
-    if current_index >= len(quiz_state['questions']):
-        print("Cycling questions...")
+    if size == 0: return jsonify({"error": "No questions available for this quiz."}), 404
+
+    # Handle cycling (same order again; answered progress is kept like before)
+    if current_index >= size:
+        logger.debug("cycling questions")
         current_index = 0 # Reset index to 0
-        quiz_state['current_question_index'] = current_index
-        random.shuffle(quiz_state['questions']) # Optional: re-shuffle on cycle
-        session.modified = True # Mark session modified due to reset/shuffle
+        quiz_state['index'] = current_index
+        session.modified = True # Mark session modified due to reset
 
     # Get question data using the potentially updated index
-    question_data = quiz_state['questions'][current_index]
-    print(f"Fetching question at index: {current_index}")
+    question_data = question_at(quiz_state, current_index)
+    if question_data is None: return jsonify({"error": "The question bank is being updated. Please try again."}), 503
+    logger.debug("fetching question", extra={"index": current_index})
 
     # Prepare response data (as before)
     response_data = {
         **question_data,
         "question_number": current_index + 1, # Use the actual index used
-        "total_questions": len(quiz_state['questions']),
-        "completed_questions": len(quiz_state.get('answered_questions', [])),
-        "correct_answers": quiz_state.get('correct_answers', 0),
-        "total_attempts": quiz_state.get('total_attempts', 0)
+        **quiz_progress(quiz_state)
     }
+    if "answer" in response_data: del response_data["answer"] # Graded server-side; quiz.js never reads it
     if "hint" in response_data: del response_data["hint"]
-
-    # --- REMOVED INCREMENT FROM HERE ---
-    # quiz_state['current_question_index'] += 1 # NO LONGER INCREMENT HERE
-    # session.modified = True # Only set if index actually changed above
+    if "aliases" in response_data: del response_data["aliases"]
 
     return jsonify(response_data)
 
 @app.route('/api/submit_answer', methods=['POST'])
 def submit_answer():
-    # ... (no changes needed in submit_answer itself for this fix) ...
-    model_check = check_model(quiz_model, "checking answers")
-    if model_check: return model_check
-
     quiz_state = session.get('quiz_state')
-    if not quiz_state: return jsonify({"error": "Quiz session not found."}), 400
+    if not qs.is_compact_state(quiz_state): return jsonify({"error": "Quiz session not found."}), 400
 
     data = request.get_json()
     if not data: return jsonify({"error": "No data received"}), 400
@@ -211,147 +300,346 @@ def submit_answer():
     try: question_id = int(question_id)
     except (ValueError, TypeError): return jsonify({"error": "Invalid question ID"}), 400
 
-    question_obj = next((q for q in quiz_state['questions'] if q["id"] == question_id), None)
-    if not question_obj: return jsonify({"error": "Question not found in session"}), 404
+    position = session_position(quiz_state, question_id)
+    question_obj = question_bank.get(question_id) if position is not None else None
+    if question_obj is None: return jsonify({"error": "Question not found in session"}), 404
 
     correct_answer = question_obj["answer"]
-    question_text = question_obj["question"]
 
     # Ensure counters exist before incrementing
-    quiz_state.setdefault('answered_questions', [])
     quiz_state.setdefault('total_attempts', 0)
     quiz_state.setdefault('correct_answers', 0)
 
-    if question_id not in quiz_state['answered_questions']:
-        quiz_state['answered_questions'].append(question_id)
+    qs.mark_answered(quiz_state, position)
     quiz_state['total_attempts'] += 1
 
-    prompt_content = f"""
-        Task: Evaluate if the user's answer to the quiz question is correct. Be precise.
-        Question: {question_text}
-        Correct Answer: {correct_answer}
-        User's Answer: {user_answer}
-        Instructions: 
-        1. Compare the user's answer to the correct answer to see if they are semantically equivalent and address the question accurately. Do not just look for keyword matches. Consider the meaning. If users answer is correct but has some spelling error give the respose as Correct [spelling error, Correct spelling: '{correct_answer}'].
-        2. If the user's answer is essentially the same as the correct answer in meaning and accurately answers the question, respond with ONLY the word: "Correct!".
-        3. If the user's answer is incorrect, or does not answer the question, or is irrelevant, respond with: "Incorrect. The correct answer is: '{correct_answer}'. [Concise explanation of why the user was wrong and what the correct concept is, focusing on the key concept]."
-        4. Keep all explanations very concise and directly related to the question and answer. Do not engage in general conversation or provide extra details.
-        5. Do not include any additional text or context outside of the answer evaluation.
-        6. Do not include any disclaimers or unnecessary information.
-        Response:"""
+    # Fast path: clearly correct/wrong answers are graded locally, no model needed
+    local_verdict = answer_grader.grade(question_obj, user_answer)
+    if local_verdict:
+        is_correct, response_text = local_verdict
+        if is_correct:
+            quiz_state['correct_answers'] += 1
+        session.modified = True
+        progress_store.record_attempt(session.get('user_id'), question_id, is_correct)
+        return jsonify({
+            "chatbot_feedback": response_text, "correct_answer": correct_answer,
+            "is_correct": is_correct, **quiz_progress(quiz_state)
+        })
+
+    model_check = check_model(quiz_model, "checking answers")
+    if model_check: return model_check
 
     is_correct = False
     response_text = f"Incorrect. The correct answer is: '{correct_answer}'. AI evaluation unavailable."
 
+    user_key = admission_key()
+    def grade_with_model():
+        admission.admit(user_key, "grading") # Cache hits don't spend model quota
+        return answer_batcher.grade(question_obj, user_answer)
+
     try:
-        response = quiz_model.generate_content(prompt_content)
-        raw_response = response.text.strip()
-        print(f"Quiz Model Raw Response: {raw_response}")
-        if raw_response.startswith("Correct!"):
-            is_correct = True
+        is_correct, response_text = verdict_cache.get_or_compute(question_obj, user_answer, grade_with_model)
+        if is_correct:
             quiz_state['correct_answers'] += 1
-            response_text = raw_response
-        elif raw_response.startswith("Incorrect."):
-             is_correct = False
-             response_text = raw_response
-        else:
-            is_correct = False
-            response_text = f"Incorrect. The correct answer is: '{correct_answer}'. (AI response format unexpected)"
+        progress_store.record_attempt(session.get('user_id'), question_id, is_correct)
 
-        session.modified = True # Mark modified due to potential correct_answers change, or answered_questions
+        session.modified = True # Mark modified due to potential correct_answers change, or answered positions
+    except AdmissionRejected as e:
+        return shed_response(e)
     except Exception as e:
-        print(f"Error using Quiz Model API for answer check: {e}")
+        logger.warning("quiz model answer check failed", extra={"error": str(e)})
         # Return error without modifying session further if API fails
         return jsonify({
             "chatbot_feedback": response_text, "correct_answer": correct_answer,
             "is_correct": False, # Explicitly false
-            "completed_questions": len(quiz_state.get('answered_questions', [])), # Reflect current state
-            "total_questions": len(quiz_state.get('questions', [])),
-            "correct_answers": quiz_state.get('correct_answers', 0),
-            "total_attempts": quiz_state.get('total_attempts', 0)
+            **quiz_progress(quiz_state) # Reflect current state
          }), 500
 
     # Return success response
     return jsonify({
         "chatbot_feedback": response_text, "correct_answer": correct_answer,
-        "is_correct": is_correct,
-        "completed_questions": len(quiz_state['answered_questions']),
-        "total_questions": len(quiz_state['questions']),
-        "correct_answers": quiz_state['correct_answers'],
-        "total_attempts": quiz_state['total_attempts']
+        "is_correct": is_correct, **quiz_progress(quiz_state)
     })
 
 
+@app.route('/api/submit_answers', methods=['POST'])
+def submit_answers():
+    """Exam mode: grades a whole answer sheet, sending every ambiguous answer to the model in one batch"""
+    quiz_state = session.get('quiz_state')
+    if not qs.is_compact_state(quiz_state): return jsonify({"error": "Quiz session not found."}), 400
+    data = request.get_json(silent=True) or {}
+    answers = data.get('answers')
+    if not isinstance(answers, list) or not answers: return jsonify({"error": "Expected a non-empty 'answers' list"}), 400
+    if len(answers) > MAX_EXAM_ANSWERS: return jsonify({"error": f"At most {MAX_EXAM_ANSWERS} answers per request"}), 400
+
+    quiz_state.setdefault('total_attempts', 0)
+    quiz_state.setdefault('correct_answers', 0)
+    results = []
+    pending = {} # (question_id, normalized answer) -> (question_obj, user_answer, [result, ...])
+    for entry in answers:
+        entry = entry if isinstance(entry, dict) else {}
+        user_answer = str(entry.get('user_answer') or "").strip()
+        try: question_id = int(entry.get('question_id'))
+        except (ValueError, TypeError):
+            results.append({"question_id": entry.get('question_id'), "error": "Invalid question ID"})
+            continue
+        position = session_position(quiz_state, question_id)
+        question_obj = question_bank.get(question_id) if position is not None else None
+        if question_obj is None:
+            results.append({"question_id": question_id, "error": "Question not found in session"})
+            continue
+        if not user_answer:
+            results.append({"question_id": question_id, "error": "Answer cannot be empty"})
+            continue
+        result = {"question_id": question_id, "correct_answer": question_obj["answer"]}
+        results.append(result)
+        qs.mark_answered(quiz_state, position)
+        quiz_state['total_attempts'] += 1
+
+        verdict = answer_grader.grade(question_obj, user_answer) or verdict_cache.get(question_obj, user_answer)
+        if verdict:
+            result["is_correct"], result["chatbot_feedback"] = verdict
+        else:
+            key = (question_id, normalize_answer(user_answer))
+            pending.setdefault(key, (question_obj, user_answer, []))[2].append(result)
+
+    # One model call per BATCH_MAX_ITEMS distinct ambiguous answers; failures fall back per item
+    model_ready = quiz_model is not None and quiz_model.available()
+    groups = list(pending.values())
+    if groups and model_ready:
+        shed = check_admission("grading", cost=math.ceil(len(groups) / BATCH_MAX_ITEMS))
+        if shed: return shed
+    for start in range(0, len(groups), BATCH_MAX_ITEMS):
+        chunk = groups[start:start + BATCH_MAX_ITEMS]
+        verdicts = None
+        if model_ready:
+            try:
+                verdicts = grade_batch(quiz_model, [(question_obj, user_answer) for question_obj, user_answer, _ in chunk])
+            except Exception as e:
+                logger.warning("quiz model batch answer check failed", extra={"error": str(e), "items": len(chunk)})
+        if verdicts is None:
+            verdicts = [(False, f"Incorrect. The correct answer is: '{q['answer']}'. AI evaluation unavailable.", None)
+                        for q, _, _ in chunk]
+        for (question_obj, user_answer, waiting), (is_correct, feedback, cacheable) in zip(chunk, verdicts):
+            if cacheable:
+                verdict_cache.put(question_obj, user_answer, is_correct, feedback)
+            for result in waiting:
+                result.update(is_correct=is_correct, chatbot_feedback=feedback)
+                if cacheable is None: result["error"] = "AI evaluation unavailable"
+
+    quiz_state['correct_answers'] += sum(1 for r in results if r.get("is_correct"))
+    session.modified = True
+    for r in results:
+        if "is_correct" in r and "error" not in r: # Fallback verdicts aren't real results
+            progress_store.record_attempt(session.get('user_id'), r["question_id"], r["is_correct"])
+    return jsonify({"results": results, **quiz_progress(quiz_state)})
+
+
 @app.route('/api/hint', methods=['POST'])
 def get_hint():
     # Hint doesn't require AI model, just fetches from data
     quiz_state = session.get('quiz_state')
-    if not quiz_state: return jsonify({"error": "Quiz session not found."}), 400
+    if not qs.is_compact_state(quiz_state): return jsonify({"error": "Quiz session not found."}), 400
     data = request.get_json();
     if not data: return jsonify({"error": "No data received"}), 400
     try: question_id = int(data.get('question_id'))
     except (ValueError, TypeError): return jsonify({"error": "Invalid question ID"}), 400
 
-    question_obj = next((q for q in quiz_state['questions'] if q["id"] == question_id), None)
+    position = session_position(quiz_state, question_id)
+    question_obj = question_bank.get(question_id) if position is not None else None
     if not question_obj: return jsonify({"error": "Question not found in session"}), 404
 
     hint = question_obj.get("hint", "No hint available.")
     return jsonify({"hint": hint, "question_id": question_id})
 
-@app.route('/api/ask_chatbot', methods=['POST'])
-def ask_chatbot():
-    model_check = check_model(quiz_model, "providing help")
-    if model_check: return model_check
-
+def parse_help_request():
+    """Validates a help request; returns (question_obj, help_question, None) or (None, None, error_response)"""
     quiz_state = session.get('quiz_state')
-    if not quiz_state: return jsonify({"error": "Quiz session context not found."}), 400
+    if not qs.is_compact_state(quiz_state): return None, None, (jsonify({"error": "Quiz session context not found."}), 400)
     data = request.get_json()
-    if not data: return jsonify({"error": "No data received for help"}), 400
+    if not data: return None, None, (jsonify({"error": "No data received for help"}), 400)
 
     help_question = data.get('help_question',"").strip()
     question_id = data.get('question_id')
-    if not help_question: return jsonify({"error": "Help question cannot be empty"}), 400
+    if not help_question: return None, None, (jsonify({"error": "Help question cannot be empty"}), 400)
     try: question_id = int(question_id)
-    except (ValueError, TypeError): return jsonify({"error": "Invalid question ID for help"}), 400
+    except (ValueError, TypeError): return None, None, (jsonify({"error": "Invalid question ID for help"}), 400)
 
-    question_obj = next((q for q in quiz_state['questions'] if q["id"] == question_id), None)
-    if not question_obj: return jsonify({"error": "Associated quiz question not found"}), 404
+    position = session_position(quiz_state, question_id)
+    question_obj = question_bank.get(question_id) if position is not None else None
+    if not question_obj: return None, None, (jsonify({"error": "Associated quiz question not found in session"}), 404)
+    return question_obj, help_question, None
 
-    question_text = question_obj["question"]
-    correct_answer = question_obj["answer"]
+@app.route('/api/ask_chatbot', methods=['POST'])
+def ask_chatbot():
+    question_obj, help_question, error = parse_help_request()
+    if error: return error
+    # A cached reply needs neither the model nor an admission token
+    cached = help_cache.lookup(question_obj, help_question)
+    if cached is not None: return jsonify({"chatbot_response": cached, "cached": True})
 
-    help_prompt_content = f"""
-        Context: User is asking for help on a quiz question.
-        Original Quiz Question: {question_text}
-        Correct Answer (for context, do not reveal directly): {correct_answer}
-        User's Help Request: {help_question}
-        Task: Answer the user's request concisely, clarifying concepts related to the quiz question without giving the answer away. Be helpful and encouraging.
-        Response:""" # Keep instructions concise
+    model_check = check_model(help_model, "providing help")
+    if model_check: return model_check
+    shed = check_admission("help")
+    if shed: return shed
+    help_prompt_content = prompts.help_request(question_obj, help_question)
 
     response_text = "Sorry, I couldn't get help from the AI assistant."
     try:
-        response = quiz_model.generate_content(help_prompt_content) # Use quiz_model
+        response = call_model(help_model, help_prompt_content)
         response_text = response.text.strip()
-        print(f"Quiz Model Help Response: {response_text}")
+        logger.debug("help model response", extra={"response": response_text})
+        help_cache.store(question_obj, help_question, response_text)
     except Exception as e:
-        print(f"Error using Quiz Model API for help: {e}")
+        logger.warning("help model call failed", extra={"error": str(e)})
 
     return jsonify({"chatbot_response": response_text})
 
+@app.route('/api/ask_chatbot/stream', methods=['POST'])
+def ask_chatbot_stream():
+    """Same as ask_chatbot, but forwards the reply as Server-Sent Events while it is generated.
+
+    Events: `data: {"text": "..."}` per chunk, then `event: done` (or `event: error`).
+    A cached reply arrives as a single chunk.
+    """
+    question_obj, help_question, error = parse_help_request()
+    if error: return error
+
+    def sse(payload, event=None):
+        prefix = f"event: {event}\n" if event else ""
+        return f"{prefix}data: {json.dumps(payload)}\n\n"
+
+    def event_stream(events):
+        return Response(events, mimetype='text/event-stream',
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    cached = help_cache.lookup(question_obj, help_question)
+    if cached is not None:
+        return event_stream([sse({"text": cached, "cached": True}), sse({}, event="done")])
+
+    model_check = check_model(help_model, "providing help")
+    if model_check: return model_check
+    shed = check_admission("help")
+    if shed: return shed
+    help_prompt_content = prompts.help_request(question_obj, help_question)
+
+    def generate():
+        sent_any = False
+        chunks = []
+        try:
+            for text in stream_model(help_model, help_prompt_content):
+                sent_any = True
+                chunks.append(text)
+                yield sse({"text": text})
+            # Only complete replies are cached; a stream that broke off is not
+            help_cache.store(question_obj, help_question, "".join(chunks))
+            yield sse({}, event="done")
+        except Exception as e:
+            logger.warning("help model stream failed", extra={"error": str(e), "partial": sent_any})
+            message = "Sorry, the AI assistant stopped responding." if sent_any else "Sorry, I couldn't get help from the AI assistant."
+            yield sse({"error": message}, event="error")
+
+    return event_stream(generate())
+
+@app.route('/api/admin/help_cache/seed', methods=['POST'])
+def seed_help_cache():
+    """Pins replies for common help requests. Requires `Authorization: Bearer <ADMIN_TOKEN>`.
+
+    Body: {"entries": [{"question_id", "help_question", "response"?}, ...]}. Entries without a
+    response are answered by the help model first.
+    """
+    denied = check_admin()
+    if denied: return denied
+    data = request.get_json(silent=True)
+    entries = data.get('entries') if isinstance(data, dict) else None
+    if not isinstance(entries, list) or not entries: return jsonify({"error": "No entries received"}), 400
+
+    seeded, failed = [], []
+    for entry in entries:
+        if not isinstance(entry, dict): continue
+        try: question_obj = question_bank.get(int(entry.get('question_id')))
+        except (ValueError, TypeError): question_obj = None
+        help_question = str(entry.get('help_question') or '').strip()
+        if not question_obj or not help_question:
+            failed.append({"entry": entry, "error": "Unknown question or empty help question"})
+            continue
+        response_text = str(entry.get('response') or '').strip()
+        if not response_text:
+            if check_model(help_model, "providing help"):
+                failed.append({"entry": entry, "error": "Help model unavailable"})
+                continue
+            try:
+                response_text = call_model(help_model, prompts.help_request(question_obj, help_question)).text.strip()
+            except Exception as e:
+                failed.append({"entry": entry, "error": str(e)})
+                continue
+        seeded.append({"question_id": question_obj["id"], "help_question": help_question, "response": response_text})
+    help_cache.seed(seeded, question_bank.get)
+    return jsonify({"seeded": len(seeded), "failed": failed})
+
 
 @app.route('/api/reset', methods=['POST'])
 def reset_quiz():
-    print("Resetting quiz state for user:", session.get('user_id', 'Unknown'))
+    logger.info("resetting quiz state", extra={"user_id": session.get('user_id', 'Unknown')})
     # Re-initializes the quiz state in the session
-    questions = questions_data_original.copy(); random.shuffle(questions)
-    session['quiz_state'] = {
-        'questions': questions, 'current_question_index': 0, 'answered_questions': [],
-        'correct_answers': 0, 'total_attempts': 0
-    }
+    quiz_state = qs.new_quiz_state() # Fresh seed -> fresh shuffle
+    # Optional filters: {"category": ..., "difficulty": ...} restrict the quiz to a slice of the bank
+    data = request.get_json(silent=True) or {}
+    for key in ('category', 'difficulty'):
+        if data.get(key): quiz_state[key] = str(data[key])
+    if quiz_size(quiz_state) == 0: return jsonify({"error": "No questions match the selected filters."}), 400
+    session['quiz_state'] = quiz_state
     session.modified = True
     return jsonify({
         "success": True, "message": "Quiz progress has been reset.",
-        "total_questions": len(questions_data_original)
+        "total_questions": quiz_size(quiz_state)
+    })
+
+def player_label(user_id):
+    """Stable pseudonym for leaderboards, so session ids are never exposed"""
+    return "Player " + hashlib.sha1(user_id.encode('utf-8')).hexdigest()[:6]
+
+@app.route('/api/leaderboard', methods=['GET'])
+def leaderboard():
+    """Top lifetime scores across all sessions, served from memory."""
+    limit = min(max(request.args.get('limit', 10, type=int), 1), progress_store.leaderboard_size)
+    me = session.get('user_id')
+    top = [{"rank": row["rank"], "player": player_label(row["user_id"]), "you": row["user_id"] == me,
+            "correct": row["correct"], "attempts": row["attempts"], "accuracy": row["accuracy"]}
+           for row in progress_store.leaderboard(limit)]
+    response = {"top": top, "updated_at": progress_store.refreshed_at}
+    if me: response["me"] = {"player": player_label(me), **progress_store.user_stats(me)}
+    return jsonify(response)
+
+@app.route('/api/question_stats', methods=['GET'])
+def question_stats():
+    """Lifetime accuracy per question across all players."""
+    return jsonify({"questions": progress_store.question_accuracy(), "updated_at": progress_store.refreshed_at,
+                    "pending_writes": progress_store.pending()})
+
+@app.route('/api/health', methods=['GET'])
+def health():
+    """Circuit breaker state, error rate and latency per model."""
+    if model_init_error: return jsonify({"status": "misconfigured", "error": model_init_error}), 503
+    clients = {"quiz": quiz_model.health(), "help": help_model.health(), "game": game_model.health()}
+    status = "ok" if all(c["available"] for c in clients.values()) else "degraded"
+    return jsonify({"status": status, "clients": clients,
+                    "model_calls": {"in_flight": inflight_count(), "limit": MAX_INFLIGHT_MODEL_CALLS},
+                    "admission": admission.snapshot()})
+
+@app.route('/api/categories', methods=['GET'])
+def get_categories():
+    """Question counts per category and difficulty, for building filtered quizzes."""
+    return jsonify(question_bank.categories())
+
+@app.route('/api/grading_stats', methods=['GET'])
+def grading_stats():
+    """Per-worker counts of how many submissions each grading stage resolved."""
+    return jsonify({
+        "local_stages": answer_grader.stage_counts,
+        "verdict_cache": {"hits": verdict_cache.hits, "misses": verdict_cache.misses},
+        "help_cache": help_cache.stats(),
+        "model_calls": {"in_flight": inflight_count(), "limit": MAX_INFLIGHT_MODEL_CALLS}
     })
 
 # == Game API Routes ==
@@ -359,60 +647,90 @@ def reset_quiz():
 def get_generated_content():
     # Game content fetch doesn't require AI model
     if not prompt_game_data: return jsonify({"error": "No game content available"}), 404
-    content_item = random.choice(prompt_game_data)
+    ensure_user_id() # Guesses are admitted per player, not per (possibly shared) address
+    # No-repeat sampler: walk a seeded permutation of the pool; only seed + cursor live in the session
+    sampler = session.get('game_sampler')
+    if not isinstance(sampler, dict) or sampler.get('cursor', 0) >= len(prompt_game_data):
+        sampler = {'seed': random.getrandbits(32), 'cursor': 0}
+    content_item = prompt_game_data[qs.permuted_position(sampler['seed'], sampler['cursor'], len(prompt_game_data))]
+    session['game_sampler'] = {'seed': sampler['seed'], 'cursor': sampler['cursor'] + 1}
     return jsonify({ "id": content_item["id"], "type": content_item["type"], "output": content_item["output"] })
 
 @app.route('/api/submit_prompt_guess', methods=['POST'])
 def submit_prompt_guess():
-    model_check = check_model(game_model, "evaluating prompt guess")
-    if model_check: return model_check
-
-    data = request.get_json()
-    if not data: return jsonify({"error": "No data received"}), 400
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data: return jsonify({"error": "No data received"}), 400
 
     content_id = data.get('content_id')
-    user_guess = data.get('user_guess',"").strip()
+    user_guess = data.get('user_guess',"")
+    wants_explanation = bool(data.get('explain'))
+    if not isinstance(content_id, str) or not isinstance(user_guess, str):
+        return jsonify({"error": "content_id and user_guess must be strings"}), 400
+    user_guess = user_guess.strip()
     if not content_id or not user_guess: return jsonify({"error": "Missing content ID or guess"}), 400
 
-    content_item = next((item for item in prompt_game_data if item["id"] == content_id), None)
+    content_item = game_content_by_id.get(content_id)
     if not content_item: return jsonify({"error": "Game content item not found"}), 404
 
     original_prompt = content_item["original_prompt"]
-    ai_output_context = content_item["output"]
-    if content_item["type"] == "text" and len(ai_output_context) > 300:
-        ai_output_context = ai_output_context[:300] + "..."
-
-    evaluation_prompt = f"""
-        Task: Evaluate similarity between "User's Guessed Prompt" and "Original Prompt" for the given "AI Output Context".
-        AI Output Context ({content_item['type']}): {ai_output_context}
-        Original Prompt: {original_prompt}
-        User's Guessed Prompt: {user_guess}
-        Instructions: Respond ONLY in the format `Similarity: [Rating]. Explanation: [Brief Explanation]`. Ratings: "Very Similar", "Somewhat Similar", "Not Similar".
-        Response:""" # Keep instructions concise
-
-    feedback = "Evaluation failed."
-    similarity = "N/A"
-    explanation = "Could not get evaluation from AI."
 
+    # Local scoring first; the model is only consulted for borderline scores or on request
+    score = prompt_similarity.score(content_id, user_guess)
+    similarity, borderline = prompt_similarity.rate(score)
+    explanation = explain_rating(similarity, score)
+    local_result = {"similarity": similarity, "feedback": explanation, "original_prompt": original_prompt,
+                    "score": round(score, 3), "source": "local"}
+    if not (borderline or wants_explanation) or check_model(game_model, "evaluating prompt guess"):
+        return jsonify(local_result)
+    # The local rating is already a full answer, so a shed guess degrades to it instead of a 429
     try:
-        response = game_model.generate_content(evaluation_prompt) # Use game_model
-        raw_feedback = response.text.strip()
-        print(f"Game Model Eval Raw Response: {raw_feedback}")
-        if raw_feedback.startswith("Similarity:") and ". Explanation:" in raw_feedback:
-             parts = raw_feedback.split(". Explanation:", 1)
-             sim_part = parts[0].replace("Similarity:", "").strip()
-             expl_part = parts[1].strip()
-             valid_sim = ["Very Similar", "Somewhat Similar", "Not Similar"]
-             if sim_part in valid_sim:
-                 similarity = sim_part
-                 explanation = expl_part
-             else: explanation = raw_feedback # Use full response if rating invalid
-        else: explanation = raw_feedback # Use full response if format invalid
+        admission.admit(admission_key(), "game")
+    except AdmissionRejected:
+        return jsonify(local_result)
 
-    except Exception as e:
-        print(f"Error using Game Model API for evaluation: {e}")
+    # Rating compares the two prompts; instructions and the JSON schema live on the model
+    try:
+        response = call_model(game_model, prompts.guess_request(original_prompt, user_guess))
+        raw_feedback = response.text
+        logger.debug("game model evaluation", extra={"response": raw_feedback})
+        evaluation = prompts.parse_guess(raw_feedback)
+        if evaluation:
+            rating, model_explanation = evaluation
+            return jsonify({**local_result, "similarity": rating, "feedback": model_explanation or explanation, "source": "model"})
+        # Unexpected format: keep the local rating rather than showing raw model text
+        logger.info("game model response format unexpected; using local rating")
 
-    return jsonify({ "similarity": similarity, "feedback": explanation, "original_prompt": original_prompt })
+    except Exception as e:
+        logger.warning("game model evaluation failed", extra={"error": str(e)})
+
+    return jsonify(local_result)
+
+@app.route('/api/admin/prompt_similarity/batch', methods=['POST'])
+def score_prompt_guesses():
+    """Scores many logged guesses locally: {"guesses": [{"content_id", "user_guess"}, ...]}.
+
+    An admin replay tool (needs ADMIN_TOKEN); `python prompt_similarity.py` does the same offline.
+    """
+    denied = check_admin()
+    if denied: return denied
+    data = request.get_json(silent=True)
+    guesses = data.get('guesses') if isinstance(data, dict) else None
+    if not isinstance(guesses, list) or not guesses: return jsonify({"error": "Expected a non-empty 'guesses' list"}), 400
+    if len(guesses) > MAX_SIMILARITY_BATCH: return jsonify({"error": f"At most {MAX_SIMILARITY_BATCH} guesses per batch"}), 400
+    pairs = [(g.get('content_id'), str(g.get('user_guess', ''))) for g in guesses if isinstance(g, dict)]
+    if len(pairs) != len(guesses): return jsonify({"error": "Each guess must be an object"}), 400
+    if not all(isinstance(content_id, str) for content_id, _ in pairs): return jsonify({"error": "Each content_id must be a string"}), 400
+
+    results = []
+    for (content_id, user_guess), score in zip(pairs, prompt_similarity.score_batch(pairs)):
+        if score != score: # NaN -> unknown content id
+            results.append({"content_id": content_id, "error": "Game content item not found"})
+            continue
+        similarity, borderline = prompt_similarity.rate(score)
+        results.append({"content_id": content_id, "user_guess": user_guess, "score": round(float(score), 3),
+                        "similarity": similarity, "borderline": borderline})
+    return jsonify({"results": results,
+                    "thresholds": {"very": prompt_similarity.very, "somewhat": prompt_similarity.somewhat, "margin": prompt_similarity.margin}})
 
 # --- Run ---
 if __name__ == '__main__':
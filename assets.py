@@ -0,0 +1,67 @@
+# --- START OF FILE assets.py ---
+# Serves the output of build_assets.py. With a manifest present, url_for('static',
+# filename='quiz.js') points at the content-hashed copy. Hashed files are sent with
+# long-lived immutable cache headers, using the pre-compressed .br/.gz variant when the
+# client accepts it. Without a manifest (no build yet) the original files are served as before.
+
+import json
+import logging
+import mimetypes
+import os
+
+from flask import request, send_from_directory
+
+logger = logging.getLogger(__name__)
+
+ASSET_MANIFEST_PATH = os.environ.get('ASSET_MANIFEST_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'dist', 'manifest.json'))
+ASSET_MAX_AGE_SECONDS = int(os.environ.get('ASSET_MAX_AGE_SECONDS', 365 * 24 * 60 * 60))
+
+# Preferred first; each maps an Accept-Encoding token to the file suffix build_assets.py writes
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def load_manifest(path=ASSET_MANIFEST_PATH):
+    """Returns {original name: hashed path relative to static/}, or {} before the first build"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("asset manifest unreadable; serving unbuilt assets", extra={"path": path, "error": str(e)})
+        return {}
+    logger.info("asset manifest loaded", extra={"assets": len(manifest), "path": path})
+    return manifest
+
+def init_app(app, manifest_path=ASSET_MANIFEST_PATH):
+    manifest = load_manifest(manifest_path)
+    # Only the current build's outputs are known to be content-hashed; anything else in the
+    # build directory (manifest.json itself, files kept with --keep-old) is served normally
+    hashed = set(manifest.values())
+    app.jinja_env.globals['assets_built'] = bool(manifest)
+
+    @app.url_defaults
+    def hashed_static_url(endpoint, values):
+        if endpoint == 'static' and values.get('filename') in manifest:
+            values['filename'] = manifest[values['filename']]
+
+    def send_static(filename):
+        if filename not in hashed:
+            return app.send_static_file(filename)
+        mimetype = mimetypes.guess_type(filename)[0]
+        for encoding, suffix in ENCODINGS:
+            if encoding in request.accept_encodings and os.path.exists(os.path.join(app.static_folder, filename + suffix)):
+                response = send_from_directory(app.static_folder, filename + suffix, mimetype=mimetype)
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(app.static_folder, filename, mimetype=mimetype)
+        # The name changes whenever the content does, so the file can be cached forever
+        response.headers['Cache-Control'] = f"public, max-age={ASSET_MAX_AGE_SECONDS}, immutable"
+        response.vary.add('Accept-Encoding')
+        return response
+
+    app.view_functions['static'] = send_static
+    return manifest
+
+# --- END OF FILE assets.py ---
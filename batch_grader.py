@@ -0,0 +1,117 @@
+# --- START OF FILE batch_grader.py ---
+# Batched model grading for quiz answers the local grader can't settle. Submissions that
+# arrive within BATCH_WINDOW_MS of each other are graded together in one structured
+# request and each waiting request gets its own verdict back. The exam endpoint grades a
+# whole answer sheet at once through grade_batch().
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+
+import metrics
+from model_calls import MODEL_CALL_TIMEOUT_SECONDS, MODEL_SLOT_WAIT_SECONDS, ModelTimeoutError, call_model
+from prompts import grading_request, parse_grading
+
+# --- Configuration ---
+BATCH_WINDOW_MS = float(os.environ.get('BATCH_WINDOW_MS', 50))        # 0 grades every answer on its own
+BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', 25))          # flush early once this many are waiting
+BATCH_MAX_CONCURRENT = int(os.environ.get('BATCH_MAX_CONCURRENT', 8)) # batches in flight per process
+
+logger = logging.getLogger(__name__)
+
+
+def grade_batch(model, items, timeout=None):
+    """Grades [(question_obj, user_answer), ...] in a single model call.
+
+    The grading instructions and JSON schema are part of the model (prompts.GRADING_MODEL_CONFIG),
+    so the request is just the items.
+    """
+    if not items: return []
+    metrics.inc("answer_batches_total")
+    metrics.inc("answer_batch_items_total", len(items))
+    response = call_model(model, grading_request(items), timeout=timeout)
+    raw_response = response.text
+    logger.debug("quiz model batch verdict", extra={"items": len(items), "response": raw_response})
+    return parse_grading(raw_response, items)
+
+
+class MicroBatcher:
+    """Collects answers for a short window and grades them with one model call.
+
+    grade() blocks until this answer's verdict is back and returns
+    (is_correct, feedback, cacheable), so it can be used as a VerdictCache compute().
+    Its deadline runs from submission: a batch queued behind BATCH_MAX_CONCURRENT busy ones
+    gets only what is left of it, and one whose waiters have all given up is not sent.
+    """
+
+    def __init__(self, model, window_ms=BATCH_WINDOW_MS, max_items=BATCH_MAX_ITEMS):
+        self.model = model
+        self.window = window_ms / 1000
+        self.max_items = max(1, max_items)
+        self._lock = threading.Lock()
+        self._pending = []  # (question_obj, user_answer, future, deadline)
+        # Window + wait for a model slot + the call's own deadline, with a little slack
+        self.wait = self.window + MODEL_SLOT_WAIT_SECONDS + MODEL_CALL_TIMEOUT_SECONDS + 1
+        self._timer = None
+        self._executor = ThreadPoolExecutor(max_workers=BATCH_MAX_CONCURRENT, thread_name_prefix='answer-batch')
+
+    def _take(self):
+        # Caller holds the lock
+        batch, self._pending = self._pending, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _flush_after_window(self, timer):
+        with self._lock:
+            if self._timer is not timer: return # Already flushed because the batch filled up
+            batch = self._take()
+        if batch: self._executor.submit(self._run, batch)
+
+    def _run(self, batch):
+        # Waiters that timed out cancelled their futures; leave them out of the request
+        batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        if not batch:
+            metrics.inc("model_call_rejections_total", reason="batch_abandoned")
+            return
+        timeout = min(MODEL_CALL_TIMEOUT_SECONDS, max(d for *_, d in batch) - time.monotonic() - MODEL_SLOT_WAIT_SECONDS)
+        try:
+            if timeout <= 0: raise ModelTimeoutError("Batched answer check spent its deadline queued.")
+            results = grade_batch(self.model, [(q, answer) for q, answer, _, _ in batch], timeout=timeout)
+        except Exception as e:
+            for _, _, future, _ in batch: future.set_exception(e)
+            return
+        for (_, _, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+    def submit(self, question_obj, user_answer):
+        future = Future()
+        with self._lock:
+            self._pending.append((question_obj, user_answer, future, time.monotonic() + self.wait))
+            if len(self._pending) >= self.max_items:
+                batch = self._take()
+            else:
+                batch = None
+                if self._timer is None:
+                    timer = threading.Timer(self.window, lambda: self._flush_after_window(timer))
+                    timer.daemon = True
+                    self._timer = timer
+                    timer.start()
+        if batch: self._executor.submit(self._run, batch)
+        return future
+
+    def grade(self, question_obj, user_answer):
+        if self.window <= 0:
+            return grade_batch(self.model, [(question_obj, user_answer)])[0]
+        future = self.submit(question_obj, user_answer)
+        try:
+            return future.result(timeout=self.wait)
+        except FuturesTimeoutError:
+            future.cancel() # Still queued: its batch drops it (or is skipped if nobody is left)
+            metrics.inc("model_call_rejections_total", reason="batch_timeout")
+            raise ModelTimeoutError(f"Batched answer check exceeded {self.wait:g}s.") from None
+
+# --- END OF FILE batch_grader.py ---
@@ -0,0 +1,11 @@
+# --- START OF FILE bench/fake_app.py ---
+# WSGI entry point for benchmarks: the real app, with Gemini replaced by the local fake.
+#   gunicorn bench.fake_app:app --config gunicorn.conf.py
+
+from bench import fake_gemini
+
+fake_gemini.install()
+
+from app import app  # noqa: E402  (must import after the fake is installed)
+
+# --- END OF FILE bench/fake_app.py ---
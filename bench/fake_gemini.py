@@ -0,0 +1,97 @@
+# --- START OF FILE bench/fake_gemini.py ---
+# Local stand-in for google.generativeai.GenerativeModel, used by the benchmark so load
+# tests don't spend API quota. Latency is log-normal around a configurable median, a
+# configurable fraction of calls fail with a transient upstream error, and responses use
+# the formats the app parses. The task is recognised from the model's system instruction
+# (JSON verdicts for grading, a JSON rating for guesses, plain text for help).
+
+import json
+import os
+import random
+import time
+
+from google.api_core import exceptions as google_exceptions
+
+FAKE_LATENCY_MS = float(os.environ.get('FAKE_GEMINI_LATENCY_MS', 800))       # median
+FAKE_LATENCY_SIGMA = float(os.environ.get('FAKE_GEMINI_LATENCY_SIGMA', 0.5))  # log-normal spread
+FAKE_ERROR_RATE = float(os.environ.get('FAKE_GEMINI_ERROR_RATE', 0.02))
+FAKE_CORRECT_RATE = float(os.environ.get('FAKE_GEMINI_CORRECT_RATE', 0.5))
+FAKE_STREAM_CHUNKS = int(os.environ.get('FAKE_GEMINI_STREAM_CHUNKS', 5))
+
+
+class _Usage:
+    def __init__(self, prompt, text):
+        # Rough 4-characters-per-token estimate, good enough for relative comparisons.
+        # `prompt` includes the system instruction, which the real API also bills per call.
+        self.prompt_token_count = max(1, len(prompt) // 4)
+        self.candidates_token_count = max(1, len(text) // 4)
+        self.total_token_count = self.prompt_token_count + self.candidates_token_count
+
+
+class FakeResponse:
+    def __init__(self, prompt, text):
+        self.text = text
+        self.usage_metadata = _Usage(prompt, text)
+
+
+def _fake_verdict(item):
+    if random.random() < FAKE_CORRECT_RATE:
+        return {"item": item, "verdict": "correct", "explanation": ""}
+    return {"item": item, "verdict": "incorrect", "explanation": "The answer refers to a different concept."}
+
+def canned_reply(prompt, system_instruction=""):
+    """Picks a reply in the format the calling task expects"""
+    if "grade answers" in system_instruction:
+        try: items = json.loads(prompt)
+        except ValueError: items = []
+        return json.dumps([_fake_verdict(row.get("item")) for row in items if isinstance(row, dict)])
+    if "Guess the Prompt" in system_instruction:
+        rating = random.choice(["Very Similar", "Somewhat Similar", "Not Similar"])
+        return json.dumps({"similarity": rating, "explanation": "The guess and the original prompt overlap in subject but differ in detail."})
+    return ("Think about what the question is really asking: which concept or system fits the description? "
+            "Focus on the key term in the question and how it is used in practice.")
+
+
+class FakeGenerativeModel:
+    """Mimics the parts of GenerativeModel the app uses: generate_content(prompt, stream=...)"""
+
+    def __init__(self, model_name, system_instruction=None, generation_config=None, **kwargs):
+        self.model_name = model_name
+        self.system_instruction = system_instruction or ""
+
+    def _wait(self, timeout):
+        latency = random.lognormvariate(0, FAKE_LATENCY_SIGMA) * FAKE_LATENCY_MS / 1000
+        if timeout and latency > timeout:
+            time.sleep(timeout)
+            raise google_exceptions.DeadlineExceeded("fake upstream deadline exceeded")
+        time.sleep(latency)
+        if random.random() < FAKE_ERROR_RATE:
+            raise google_exceptions.ServiceUnavailable("fake upstream unavailable")
+
+    def generate_content(self, prompt, stream=False, request_options=None, **kwargs):
+        prompt = prompt if isinstance(prompt, str) else str(prompt)
+        timeout = (request_options or {}).get('timeout')
+        text = canned_reply(prompt, self.system_instruction)
+        billed = self.system_instruction + prompt
+        if not stream:
+            self._wait(timeout)
+            return FakeResponse(billed, text)
+        return self._stream(billed, text, timeout)
+
+    def _stream(self, prompt, text, timeout):
+        self._wait(timeout) # time to first token
+        words = text.split(" ")
+        step = max(1, len(words) // FAKE_STREAM_CHUNKS)
+        for i in range(0, len(words), step):
+            time.sleep(FAKE_LATENCY_MS / 1000 / FAKE_STREAM_CHUNKS / 4)
+            yield FakeResponse(prompt, " ".join(words[i:i + step]) + " ")
+
+
+def install():
+    """Routes every GenerativeModel the app creates to the fake backend"""
+    import google.generativeai as genai
+    os.environ.setdefault('GOOGLE_API_KEY', 'fake-key-for-benchmarks')
+    genai.configure = lambda **kwargs: None
+    genai.GenerativeModel = FakeGenerativeModel
+
+# --- END OF FILE bench/fake_gemini.py ---
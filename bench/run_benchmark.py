@@ -0,0 +1,213 @@
+# --- START OF FILE bench/run_benchmark.py ---
+# Load test against real gunicorn processes backed by the fake Gemini model.
+#
+#   python -m bench.run_benchmark --configs 1x8,2x16,4x32 --players 50 --duration 30
+#
+# For each WORKERSxTHREADS config a fresh gunicorn is started, simulated players run the
+# quiz flow (question -> answer -> hint/help -> next) and the game loop for the given
+# duration, and throughput, p50/p95/p99 latency, error and 429 (shed) counts and
+# cookie/response sizes are reported per endpoint. --json writes the same numbers for
+# comparing runs.
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from question_bank import QuestionBank
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HELP_QUESTIONS = ["What does this question mean?", "Can you explain the key concept?", "Is there an example of this?"]
+GAME_GUESSES = ["Write a poem about robots", "Describe a city of the future", "Explain a technical concept simply",
+                "Create a recipe inspired by space", "Tell a short story about nature"]
+
+
+def percentile(sorted_values, q):
+    if not sorted_values: return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = []     # (endpoint, seconds, status, response bytes)
+        self.cookie_sizes = []
+
+    def add(self, endpoint, seconds, status, size, cookie_size):
+        with self._lock:
+            self.samples.append((endpoint, seconds, status, size))
+            if cookie_size: self.cookie_sizes.append(cookie_size)
+
+
+class Player:
+    """One simulated user with its own cookie jar; answers are looked up in the server's question bank file"""
+
+    def __init__(self, base_url, recorder, args, bank):
+        self.base_url, self.recorder, self.args, self.bank = base_url, recorder, args, bank
+        self.http = requests.Session()
+        self.started_quiz = False
+
+    def call(self, endpoint, method='GET', path=None, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.http.request(method, self.base_url + (path or endpoint), timeout=self.args.request_timeout, **kwargs)
+            status, size = response.status_code, len(response.content)
+            data = response.json() if response.headers.get('Content-Type', '').startswith('application/json') else None
+        except (requests.RequestException, ValueError):
+            status, size, data = 0, 0, None
+        cookie = self.http.cookies.get('session')
+        self.recorder.add(endpoint, time.perf_counter() - started, status, size, len(cookie) if cookie else 0)
+        return status, data
+
+    def pick_answer(self, answer):
+        roll = random.random()
+        if roll < 0.4: return answer                                        # correct
+        if roll < 0.55 and len(answer) > 4:                                 # typo
+            i = random.randrange(len(answer))
+            return answer[:i] + answer[i + 1:]
+        if roll < 0.8: return f"{answer.split()[0]} technology"             # ambiguous -> model
+        return random.choice(["no idea", "quantum computing", "robots"])    # wrong
+
+    def quiz_round(self):
+        status, question = self.call('/api/question', path='/api/question' + ('?next=true' if self.started_quiz else ''))
+        self.started_quiz = True
+        if status != 200 or not question: return
+        record = self.bank.get(question["id"])
+        payload = {"question_id": question["id"], "user_answer": self.pick_answer(record["answer"] if record else "answer")}
+        self.call('/api/submit_answer', 'POST', json=payload)
+        if random.random() < 0.3:
+            self.call('/api/hint', 'POST', json={"question_id": question["id"]})
+        if random.random() < self.args.help_share:
+            self.call('/api/ask_chatbot', 'POST', json={"question_id": question["id"], "help_question": random.choice(HELP_QUESTIONS)})
+
+    def game_round(self):
+        status, content = self.call('/api/generated_content')
+        if status != 200 or not content: return
+        self.call('/api/submit_prompt_guess', 'POST', json={
+            "content_id": content["id"], "user_guess": random.choice(GAME_GUESSES), "explain": random.random() < 0.1})
+
+    def run(self, deadline):
+        while time.monotonic() < deadline:
+            if random.random() < self.args.game_share: self.game_round()
+            else: self.quiz_round()
+
+
+def start_server(workers, threads, args, workdir):
+    port = free_port()
+    env = dict(os.environ,
+               WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(threads), LOG_LEVEL='WARNING',
+               FAKE_GEMINI_LATENCY_MS=str(args.latency_ms), FAKE_GEMINI_LATENCY_SIGMA=str(args.latency_sigma),
+               FAKE_GEMINI_ERROR_RATE=str(args.error_rate),
+               VERDICT_CACHE_PATH=os.path.join(workdir, 'verdicts.sqlite3'), METRICS_DIR=os.path.join(workdir, 'metrics'),
+               ADMISSION_DB_PATH=os.path.join(workdir, 'admission.sqlite3'),
+               PROGRESS_DB_PATH=os.path.join(workdir, 'progress.sqlite3'),
+               HELP_CACHE_PATH=os.path.join(workdir, 'help_cache.sqlite3'))
+    if args.user_rate: env['ADMISSION_USER_RATE'] = str(args.user_rate)
+    if args.global_rate: env['ADMISSION_GLOBAL_RATE'] = str(args.global_rate)
+    log = open(os.path.join(workdir, 'gunicorn.log'), 'w')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'bench.fake_app:app', '--config', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}'],
+        cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited early; see {log.name}")
+        try:
+            requests.get(base_url + '/api/health', timeout=1)
+            return process, base_url
+        except requests.RequestException:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"gunicorn did not become ready; see {log.name}")
+
+def summarize(recorder, elapsed):
+    by_endpoint = {}
+    for endpoint, seconds, status, size in recorder.samples:
+        by_endpoint.setdefault(endpoint, []).append((seconds, status, size))
+    def stats(rows):
+        latencies = sorted(r[0] for r in rows)
+        return {
+            "requests": len(rows), "rps": round(len(rows) / elapsed, 1),
+            "errors": sum(1 for r in rows if r[1] == 0 or r[1] >= 500),
+            "shed": sum(1 for r in rows if r[1] == 429),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+            "avg_response_bytes": round(sum(r[2] for r in rows) / len(rows)),
+        }
+    all_rows = [row for rows in by_endpoint.values() for row in rows]
+    return {
+        "overall": stats(all_rows) if all_rows else {},
+        "endpoints": {endpoint: stats(rows) for endpoint, rows in sorted(by_endpoint.items())},
+        "max_cookie_bytes": max(recorder.cookie_sizes, default=0),
+    }
+
+def print_report(label, summary):
+    print(f"\n=== {label} ===")
+    print(f"{'endpoint':<28}{'reqs':>8}{'rps':>8}{'err':>6}{'429':>6}{'p50ms':>9}{'p95ms':>9}{'p99ms':>9}{'avgB':>8}")
+    rows = list(summary["endpoints"].items()) + [("TOTAL", summary["overall"])]
+    for endpoint, s in rows:
+        if not s: continue
+        print(f"{endpoint:<28}{s['requests']:>8}{s['rps']:>8}{s['errors']:>6}{s['shed']:>6}{s['p50_ms']:>9}{s['p95_ms']:>9}{s['p99_ms']:>9}{s['avg_response_bytes']:>8}")
+    print(f"max session cookie: {summary['max_cookie_bytes']} bytes")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the app under gunicorn with a fake Gemini backend.")
+    parser.add_argument('--configs', default='1x8,2x16,4x32', help="Comma-separated WORKERSxTHREADS settings")
+    parser.add_argument('--players', type=int, default=50, help="Concurrent simulated players")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds of load per config")
+    parser.add_argument('--latency-ms', type=float, default=800, help="Median fake model latency")
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help="Log-normal spread of fake latency")
+    parser.add_argument('--error-rate', type=float, default=0.02, help="Fraction of fake model calls that fail")
+    parser.add_argument('--game-share', type=float, default=0.3, help="Fraction of rounds spent in the game loop")
+    parser.add_argument('--help-share', type=float, default=0.2, help="Chance a quiz round asks the AI helper")
+    parser.add_argument('--user-rate', type=float, help="Override ADMISSION_USER_RATE (model requests/s per player)")
+    parser.add_argument('--global-rate', type=float, help="Override ADMISSION_GLOBAL_RATE (model requests/s per host)")
+    parser.add_argument('--request-timeout', type=float, default=60)
+    parser.add_argument('--json', help="Write results to this file")
+    args = parser.parse_args(argv)
+
+    bank = QuestionBank() # Same QUESTION_BANK_PATH as the server, which inherits this environment
+    results = {}
+    for config in args.configs.split(','):
+        workers, threads = (int(x) for x in config.lower().split('x'))
+        with tempfile.TemporaryDirectory() as workdir:
+            process, base_url = start_server(workers, threads, args, workdir)
+            try:
+                recorder = Recorder()
+                deadline = time.monotonic() + args.duration
+                players = [threading.Thread(target=Player(base_url, recorder, args, bank).run, args=(deadline,), daemon=True)
+                           for _ in range(args.players)]
+                started = time.monotonic()
+                for t in players: t.start()
+                for t in players: t.join()
+                summary = summarize(recorder, time.monotonic() - started)
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+        label = f"{workers} workers x {threads} threads, {args.players} players"
+        print_report(label, summary)
+        results[config] = summary
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+# --- END OF FILE bench/run_benchmark.py ---
@@ -0,0 +1,114 @@
+# --- START OF FILE build_assets.py ---
+# Front-end build: compiles and purges Tailwind for each page group, minifies the JS/CSS,
+# writes content-hashed copies to static/dist/ with a manifest, and pre-compresses them.
+#
+#   npm install            # once: tailwindcss + esbuild from package.json
+#   python build_assets.py
+#
+# assets.py reads static/dist/manifest.json, so url_for('static', filename='quiz.js')
+# resolves to e.g. dist/quiz.3f2a9c1d0b.js. Brotli variants need `pip install brotli`;
+# without it only .gz files are written.
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(REPO_ROOT, 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+TAILWIND_INPUT = os.path.join(STATIC_DIR, 'src', 'tailwind.css')
+
+# Manifest name -> Tailwind config; each page group gets its own purged stylesheet
+TAILWIND_BUNDLES = {
+    "menu.css": os.path.join('templates', 'tailwind.config.js'),
+    "app.css": os.path.join('templates', 'tailwind.app.config.js'),
+}
+# Hand-written files that are only minified
+PLAIN_ASSETS = ("quiz.js", "game.js", "styles.css")
+HASH_LENGTH = 10
+MIN_COMPRESS_BYTES = 512 # Smaller files aren't worth a compressed variant
+
+
+def run_tool(args):
+    """Runs a locally installed npm tool (never downloads one on the fly)"""
+    npx = shutil.which('npx')
+    if not npx:
+        raise SystemExit("ERROR: npx not found; install Node.js and run `npm install` first.")
+    result = subprocess.run([npx, '--no-install'] + args, cwd=REPO_ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(f"ERROR: {' '.join(args[:1])} failed:\n{result.stderr.strip()}")
+
+def build_tailwind(config, out_path):
+    run_tool(['tailwindcss', '--config', config, '--input', TAILWIND_INPUT, '--output', out_path, '--minify'])
+
+def minify(src_path, out_path):
+    run_tool(['esbuild', src_path, '--minify', '--log-level=warning', f'--outfile={out_path}'])
+
+def hashed_name(name, data):
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}"
+
+def write_variants(path, data):
+    """Writes the file plus .gz (and .br when available) next to it"""
+    with open(path, 'wb') as f: f.write(data)
+    if len(data) < MIN_COMPRESS_BYTES: return
+    # mtime=0 keeps the gzip bytes identical across rebuilds of the same input
+    with open(path + '.gz', 'wb') as f: f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli:
+        with open(path + '.br', 'wb') as f: f.write(brotli.compress(data, quality=11))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build hashed, minified and pre-compressed static assets.")
+    parser.add_argument('--out', default=DIST_DIR, help="Output directory (must be inside static/)")
+    parser.add_argument('--keep-old', action='store_true', help="Keep files from earlier builds (e.g. during a rolling deploy)")
+    args = parser.parse_args(argv)
+
+    out_dir = os.path.abspath(args.out)
+    prefix = os.path.relpath(out_dir, STATIC_DIR).replace(os.sep, '/')
+    if prefix.startswith('..'):
+        print("ERROR: --out must be inside the static folder.")
+        return 2
+    if os.path.isdir(out_dir) and not args.keep_old:
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+
+    manifest = {}
+    with tempfile.TemporaryDirectory() as work:
+        built = {}
+        for name, config in TAILWIND_BUNDLES.items():
+            built[name] = os.path.join(work, name)
+            build_tailwind(config, built[name])
+        for name in PLAIN_ASSETS:
+            built[name] = os.path.join(work, name)
+            minify(os.path.join(STATIC_DIR, name), built[name])
+
+        for name, path in built.items():
+            with open(path, 'rb') as f: data = f.read()
+            target = hashed_name(name, data)
+            write_variants(os.path.join(out_dir, target), data)
+            manifest[name] = f"{prefix}/{target}"
+            source = os.path.join(STATIC_DIR, name)
+            original = f" (from {os.path.getsize(source)} B)" if os.path.exists(source) else ""
+            print(f"{name:<12} -> {manifest[name]}  {len(data)} B{original}")
+
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    if not brotli:
+        print("note: brotli module not installed; only .gz variants were written")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+# --- END OF FILE build_assets.py ---
@@ -0,0 +1,50 @@
+# --- START OF FILE game_content.py ---
+# Content store for "Guess the Prompt": a JSONL file of pre-generated items, written by
+# generate_game_content.py and loaded once at startup. Nothing is generated on the request path.
+
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+GAME_CONTENT_PATH = os.environ.get('GAME_CONTENT_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'game_content.jsonl'))
+
+REQUIRED_FIELDS = ("id", "type", "original_prompt", "output")
+
+
+def content_id_for(prompt):
+    """Stable id for a generated item, so reruns of the pipeline can skip finished prompts"""
+    return "p" + hashlib.sha1(prompt.strip().casefold().encode('utf-8')).hexdigest()[:12]
+
+def load_game_content(path=GAME_CONTENT_PATH):
+    """Reads all valid items from the store; malformed lines are skipped with a warning"""
+    items, seen = [], set()
+    if not os.path.exists(path):
+        logger.warning("game content store not found", extra={"path": path})
+        return items
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip(): continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                logger.warning("skipping malformed game content line", extra={"line": line_number, "error": str(e)})
+                continue
+            if not all(item.get(field) for field in REQUIRED_FIELDS) or item["id"] in seen:
+                continue
+            seen.add(item["id"])
+            items.append(item)
+    logger.info("game content loaded", extra={"items": len(items), "path": path})
+    return items
+
+def append_game_content(path, items):
+    """Appends items to the store (one JSON object per line), flushing after each batch"""
+    with open(path, 'a', encoding='utf-8') as f:
+        for item in items:
+            f.write(json.dumps(item, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+# --- END OF FILE game_content.py ---
@@ -0,0 +1,140 @@
+# --- START OF FILE generate_game_content.py ---
+# Offline pipeline that fills the "Guess the Prompt" content store ahead of time.
+#
+#   python generate_game_content.py --count 500 --concurrency 8
+#   python generate_game_content.py --prompts my_prompts.txt
+#
+# Prompt ideas come from --prompts (one per line) or are generated by the model and
+# checkpointed next to the store. Finished items are appended as they complete, so an
+# interrupted or partially failed run can simply be re-run: done prompts are skipped.
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import google.generativeai as genai
+
+from game_content import GAME_CONTENT_PATH, append_game_content, content_id_for, load_game_content
+from model_calls import call_model
+
+IDEA_BATCH_SIZE = 25
+MAX_ATTEMPTS = 3
+MAX_IDLE_IDEA_ROUNDS = 5  # consecutive idea batches that fail or add nothing new before giving up
+DEFAULT_TOPICS = ["science", "technology", "nature", "food", "history", "space", "art", "everyday life", "fantasy", "sports"]
+
+
+class IdeaGenerationError(Exception):
+    """Prompt idea generation stopped making progress (bad key, persistent upstream error, only duplicates)"""
+
+
+def generate_ideas(model, count, topics, ideas_path):
+    """Returns `count` prompt ideas, reusing (and extending) the checkpoint file"""
+    ideas = []
+    if os.path.exists(ideas_path):
+        with open(ideas_path, encoding='utf-8') as f:
+            ideas = [line.strip() for line in f if line.strip()]
+    seen = {idea.casefold() for idea in ideas}
+    idle_rounds = 0
+    while len(ideas) < count:
+        if idle_rounds >= MAX_IDLE_IDEA_ROUNDS:
+            raise IdeaGenerationError(f"no new prompt ideas in {idle_rounds} consecutive batches ({len(ideas)}/{count} checkpointed)")
+        topic = random.choice(topics)
+        request_text = f"""
+            Task: Write {IDEA_BATCH_SIZE} diverse, creative one-sentence prompts that someone might give an AI text generator, on the theme "{topic}".
+            Mix tasks: poems, short descriptions, explanations, recipes, stories, product pitches.
+            Respond ONLY with a JSON array of strings."""
+        try:
+            raw = call_model(model, request_text).text.strip()
+            batch = json.loads(raw[raw.index('['):raw.rindex(']') + 1])
+        except Exception as e:
+            idle_rounds += 1
+            print(f"Warning: prompt idea batch failed ({e}); attempt {idle_rounds}/{MAX_IDLE_IDEA_ROUNDS}")
+            if idle_rounds < MAX_IDLE_IDEA_ROUNDS: time.sleep(2 ** idle_rounds + random.random())
+            continue
+        new = list({idea.strip().casefold(): idea.strip() for idea in batch if isinstance(idea, str) and idea.strip()
+                    and idea.strip().casefold() not in seen}.values())
+        new = new[:count - len(ideas)]
+        if not new:
+            idle_rounds += 1
+            print(f"Warning: prompt idea batch had only duplicates; attempt {idle_rounds}/{MAX_IDLE_IDEA_ROUNDS}")
+            continue
+        idle_rounds = 0
+        seen.update(idea.casefold() for idea in new)
+        ideas.extend(new)
+        with open(ideas_path, 'a', encoding='utf-8') as f:
+            f.writelines(idea + "\n" for idea in new)
+        print(f"Prompt ideas: {len(ideas)}/{count}")
+    return ideas[:count]
+
+def generate_item(model, prompt):
+    """Generates the output for one prompt, retrying with backoff"""
+    request_text = f"{prompt}\n\n(Keep the response under 80 words. Do not restate the request.)"
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            output = call_model(model, request_text).text.strip()
+            if output:
+                return {"id": content_id_for(prompt), "type": "text", "original_prompt": prompt, "output": output}
+            raise ValueError("empty response")
+        except Exception as e:
+            if attempt == MAX_ATTEMPTS: raise
+            delay = 2 ** attempt + random.random()
+            print(f"Warning: generation failed for {prompt[:40]!r} ({e}); retry {attempt}/{MAX_ATTEMPTS - 1} in {delay:.1f}s")
+            time.sleep(delay)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-generate prompt/output pairs for the Guess the Prompt game.")
+    parser.add_argument('--store', default=GAME_CONTENT_PATH, help="JSONL content store to append to")
+    parser.add_argument('--prompts', help="File with one prompt per line (otherwise ideas are generated)")
+    parser.add_argument('--count', type=int, default=100, help="Number of generated prompt ideas (ignored with --prompts)")
+    parser.add_argument('--topics', default=",".join(DEFAULT_TOPICS), help="Comma-separated themes for generated ideas")
+    parser.add_argument('--concurrency', type=int, default=4, help="Maximum parallel model calls")
+    parser.add_argument('--model', default=os.environ.get('GAME_CONTENT_MODEL', 'gemini-2.0-flash'))
+    args = parser.parse_args(argv)
+
+    api_key = os.environ.get('GOOGLE_API_KEY')
+    if not api_key:
+        print("ERROR: GOOGLE_API_KEY environment variable not set.")
+        return 2
+    genai.configure(api_key=api_key)
+    model = genai.GenerativeModel(args.model)
+
+    if args.prompts:
+        with open(args.prompts, encoding='utf-8') as f:
+            prompts = [line.strip() for line in f if line.strip()]
+    else:
+        topics = [t.strip() for t in args.topics.split(',') if t.strip()]
+        try:
+            prompts = generate_ideas(model, args.count, topics, args.store + ".ideas.txt")
+        except IdeaGenerationError as e:
+            print(f"ERROR: {e}. Check GOOGLE_API_KEY / the model, then re-run the same command to resume.")
+            return 1
+
+    done = {item["id"] for item in load_game_content(args.store)}
+    pending = list({content_id_for(p): p for p in prompts if content_id_for(p) not in done}.values())
+    print(f"{len(prompts)} prompts, {len(prompts) - len(pending)} already in store, {len(pending)} to generate")
+
+    failures = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as executor:
+        futures = {executor.submit(generate_item, model, prompt): prompt for prompt in pending}
+        for finished, future in enumerate(as_completed(futures), 1):
+            try:
+                append_game_content(args.store, [future.result()])
+            except Exception as e:
+                failures += 1
+                print(f"ERROR: giving up on {futures[future][:60]!r}: {e}")
+            if finished % 10 == 0 or finished == len(futures):
+                print(f"Progress: {finished}/{len(futures)} ({failures} failed)")
+
+    if failures:
+        print(f"{failures} prompts failed; re-run the same command to resume.")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+# --- END OF FILE generate_game_content.py ---
@@ -0,0 +1,38 @@
+# --- START OF FILE gunicorn.conf.py ---
+# Loaded automatically by gunicorn from the working directory.
+# Threaded workers: a request waiting on Gemini only ties up one thread, not the whole
+# worker, so pages and static files keep being served while model calls are in flight.
+
+import multiprocessing
+import os
+
+import metrics
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 4)))
+threads = int(os.environ.get('GUNICORN_THREADS', 32))
+# Must stay above MODEL_CALL_TIMEOUT_SECONDS so model deadlines fire before gunicorn kills the worker
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+keepalive = 5
+
+
+def on_starting(server):
+    # Snapshot files from a previous run would otherwise be summed into this run's totals
+    metrics.clear()
+
+def child_exit(server, worker):
+    # Keeps the exited worker's counts in dead.json so host-wide totals never go backwards
+    metrics.mark_process_dead(worker.pid)
+
+def worker_exit(server, worker):
+    # Final snapshot, so counts since the last periodic flush are not lost
+    metrics.flush()
+
+def post_fork(server, worker):
+    # MODEL_WARMUP=1 builds the Gemini clients in each worker; MODEL_WARMUP=request also sends a tiny test call
+    mode = os.environ.get('MODEL_WARMUP', '').lower()
+    if mode in ('1', 'true', 'request'):
+        from app import warm_up_models
+        warm_up_models(send_request=(mode == 'request'))
+
+# --- END OF FILE gunicorn.conf.py ---
@@ -0,0 +1,249 @@
+# --- START OF FILE help_cache.py ---
+# Semantic cache for chatbot help replies. Help requests are embedded locally with the
+# hashed n-gram vectors from prompt_similarity.py and compared (cosine, NumPy) against
+# earlier requests for the same question; a close enough match returns the stored
+# reply without a model call. Rows carry the question's version (question_bank.question_version),
+# so replies written against an older answer or wording are never served and are dropped
+# on the next store. Filler words ("question", "please", "can you") are dropped before
+# embedding, and a reply is only reused when both requests carry the same negation words,
+# since "is it related?" and "is it not related?" differ by a single word. Entries live in a SQLite (WAL) file shared by all workers;
+# each worker keeps an in-memory index per question, LRU-bounded, and picks up rows
+# other workers wrote every HELP_CACHE_SYNC_SECONDS. Seeded entries are pinned.
+#
+# Seed from the command line (one JSON object per line: question_id, help_question, response;
+# question ids are looked up in the question bank):
+#     python help_cache.py seed data/help_seeds.jsonl
+
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import metrics
+from answer_grader import NEGATIONS
+from prompt_similarity import embed_texts
+from question_bank import QuestionBank, question_version
+from sqlite_local import LocalConnection
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+HELP_CACHE_PATH = os.environ.get('HELP_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'help_cache.sqlite3'))
+HELP_CACHE_THRESHOLD = float(os.environ.get('HELP_CACHE_THRESHOLD', 0.8))            # cosine similarity for a hit; > 1 disables lookups
+HELP_CACHE_MAX_PER_QUESTION = int(os.environ.get('HELP_CACHE_MAX_PER_QUESTION', 32)) # unpinned replies kept per question (LRU)
+HELP_CACHE_MAX_QUESTIONS = int(os.environ.get('HELP_CACHE_MAX_QUESTIONS', 256))      # questions indexed in memory per worker (LRU)
+HELP_CACHE_DIMENSIONS = int(os.environ.get('HELP_CACHE_DIMENSIONS', 1024))
+HELP_CACHE_SYNC_SECONDS = float(os.environ.get('HELP_CACHE_SYNC_SECONDS', 5))
+
+# Words that say nothing about what the student is asking, in a cache that is already per question
+FILLER = {"question", "please", "can", "could", "would", "you", "me", "i", "my"}
+# Negations plus words that turn a request around ("use" vs "avoid"); these must match exactly
+CONTRASTS = NEGATIONS | {"avoid", "instead", "except", "unlike", "opposite", "rather", "stop", "prevent"}
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS help_replies ('
+    ' id INTEGER PRIMARY KEY AUTOINCREMENT, question_id INTEGER NOT NULL, question_version TEXT NOT NULL,'
+    ' help_question TEXT NOT NULL, response TEXT NOT NULL, pinned INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS help_replies_question ON help_replies (question_id, question_version, id)',
+)
+
+
+def _terms(text):
+    """Lowercased words of a help request, with "n't" endings read as "not"."""
+    words = re.findall(r"[a-z0-9']+", (text or '').casefold())
+    return ["not" if w.endswith("n't") else w.replace("'", "") for w in words]
+
+def _negations(text):
+    return frozenset(w for w in _terms(text) if w in CONTRASTS)
+
+
+class _QuestionIndex:
+    """Cached replies for one question: row id -> (vector, response, pinned, negations), least recently used first"""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.last_id = 0
+        self.synced_at = 0.0
+        self._ids = None     # row order of _matrix; rebuilt after any change
+        self._matrix = None
+
+    def add(self, row_id, vector, response, pinned, negations):
+        if row_id in self.entries: return
+        self.entries[row_id] = (vector, response, pinned, negations)
+        self._ids = None
+
+    def evict(self, max_unpinned):
+        unpinned = [row_id for row_id, (_, _, pinned, _) in self.entries.items() if not pinned]
+        for row_id in unpinned[:max(0, len(unpinned) - max_unpinned)]:
+            del self.entries[row_id]
+            self._ids = None
+
+    def nearest(self, vector, negations):
+        """Returns (row_id, similarity) of the closest entry with the same negation words, or None"""
+        if not self.entries: return None
+        if self._ids is None:
+            self._ids = list(self.entries)
+            self._matrix = np.stack([self.entries[row_id][0] for row_id in self._ids])
+        same = np.fromiter((self.entries[row_id][3] == negations for row_id in self._ids), dtype=bool, count=len(self._ids))
+        if not same.any(): return None
+        scores = np.where(same, self._matrix @ vector, -np.inf)
+        best = int(np.argmax(scores))
+        return self._ids[best], float(scores[best])
+
+
+class HelpCache:
+    """question + help request -> stored reply, matched by similarity rather than exact text.
+
+    lookup() and store() never raise on storage errors; the cache just misses.
+    """
+
+    def __init__(self, path=HELP_CACHE_PATH, threshold=HELP_CACHE_THRESHOLD,
+                 max_per_question=HELP_CACHE_MAX_PER_QUESTION, max_questions=HELP_CACHE_MAX_QUESTIONS):
+        self.path = path
+        self.threshold = threshold
+        self.max_per_question = max_per_question
+        self.max_questions = max_questions
+        self._connect = LocalConnection(path, timeout=5)
+        self._lock = threading.Lock()
+        self._questions = OrderedDict()  # (question_id, version) -> _QuestionIndex, least recently used first
+        self.hits = 0
+        self.misses = 0
+        self._ensure_schema()
+
+    def _ensure_schema(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = self._connect()
+        for statement in SCHEMA:
+            conn.execute(statement)
+
+    @staticmethod
+    def _embed(texts):
+        return embed_texts([" ".join(w for w in _terms(text) if w not in FILLER) for text in texts], HELP_CACHE_DIMENSIONS)
+
+    def _index(self, key):
+        """The in-memory index for a (question_id, version), synced with rows written since its last sync"""
+        with self._lock:
+            index = self._questions.get(key)
+            if index is None:
+                index = self._questions[key] = _QuestionIndex()
+                while len(self._questions) > self.max_questions:
+                    self._questions.popitem(last=False)
+            self._questions.move_to_end(key)
+            if time.monotonic() - index.synced_at < HELP_CACHE_SYNC_SECONDS:
+                return index
+            last_id = index.last_id
+        # Newest rows only: the in-memory LRU would evict anything older straight away
+        rows = self._connect().execute(
+            'SELECT id, help_question, response, pinned FROM help_replies'
+            ' WHERE question_id = ? AND question_version = ? AND id > ? ORDER BY id DESC', (*key, last_id)).fetchall()
+        rows = [r for r in rows if r[3]] + [r for r in rows if not r[3]][:self.max_per_question]
+        rows.sort()
+        vectors = self._embed([r[1] for r in rows]) if rows else []
+        with self._lock:
+            for (row_id, help_question, response, pinned), vector in zip(rows, vectors):
+                index.add(row_id, vector, response, bool(pinned), _negations(help_question))
+                index.last_id = max(index.last_id, row_id)
+            index.evict(self.max_per_question)
+            index.synced_at = time.monotonic()
+        return index
+
+    def lookup(self, question_obj, help_question):
+        """Returns the stored reply for the closest earlier request, or None below the threshold"""
+        if self.threshold > 1: return None
+        try:
+            index = self._index((question_obj["id"], question_version(question_obj)))
+        except sqlite3.Error as e:
+            logger.warning("help cache read failed", extra={"error": str(e)})
+            return None
+        vector = self._embed([help_question])[0]
+        with self._lock:
+            match = index.nearest(vector, _negations(help_question))
+            if match is not None and match[1] >= self.threshold:
+                row_id, similarity = match
+                index.entries.move_to_end(row_id)
+                self.hits += 1
+                response = index.entries[row_id][1]
+            else:
+                self.misses += 1
+                response = None
+        metrics.inc("help_cache_requests_total", result="hit" if response is not None else "miss")
+        if response is not None:
+            logger.debug("help cache hit", extra={"question_id": question_obj["id"], "similarity": round(similarity, 3)})
+        return response
+
+    def store(self, question_obj, help_question, response, pinned=False):
+        """Saves a reply; visible to this worker at once and to the others after their next sync"""
+        response = (response or '').strip()
+        if not help_question or not response: return
+        key = (question_obj["id"], question_version(question_obj))
+        try:
+            conn = self._connect()
+            row_id = conn.execute(
+                'INSERT INTO help_replies (question_id, question_version, help_question, response, pinned, created_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?)', (*key, help_question, response, int(pinned), time.time())).lastrowid
+            # Replies to an earlier version of the question can never match again
+            conn.execute('DELETE FROM help_replies WHERE question_id = ? AND question_version != ?', key)
+            # Keep the table bounded too; workers' LRU orders differ, so trim by age here
+            conn.execute(
+                'DELETE FROM help_replies WHERE id IN (SELECT id FROM help_replies WHERE question_id = ? AND pinned = 0'
+                ' ORDER BY id DESC LIMIT -1 OFFSET ?)', (key[0], self.max_per_question))
+        except sqlite3.Error as e:
+            logger.warning("help cache write failed", extra={"error": str(e)})
+            return
+        vector = self._embed([help_question])[0]
+        with self._lock:
+            for stale in [k for k in self._questions if k[0] == key[0] and k != key]:
+                del self._questions[stale]
+            index = self._questions.get(key)
+            if index is not None:
+                index.add(row_id, vector, response, pinned, _negations(help_question))
+                index.evict(self.max_per_question)
+
+    def seed(self, entries, get_question):
+        """Pins admin-provided replies: [{"question_id", "help_question", "response"}, ...].
+
+        get_question maps a question id to its current record (e.g. QuestionBank.get). Returns the number stored.
+        """
+        stored = 0
+        for entry in entries:
+            try: question_obj = get_question(int(entry["question_id"]))
+            except (KeyError, TypeError, ValueError): continue
+            if not question_obj: continue
+            help_question = str(entry.get("help_question") or '').strip()
+            response = str(entry.get("response") or '').strip()
+            if not help_question or not response: continue
+            self.store(question_obj, help_question, response, pinned=True)
+            stored += 1
+        logger.info("help cache seeded", extra={"entries": stored})
+        return stored
+
+    def stats(self):
+        with self._lock:
+            entries = sum(len(index.entries) for index in self._questions.values())
+            return {"hits": self.hits, "misses": self.misses, "questions_indexed": len(self._questions),
+                    "entries_indexed": entries, "threshold": self.threshold}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the chatbot help cache.")
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    seed_parser = subcommands.add_parser('seed', help="Pin replies from a JSONL file (question_id, help_question, response)")
+    seed_parser.add_argument('file')
+    args = parser.parse_args()
+
+    with open(args.file, encoding='utf-8') as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    stored = HelpCache().seed(entries, QuestionBank().get)
+    print(f"Seeded {stored} of {len(entries)} help replies into {HELP_CACHE_PATH}")
+
+if __name__ == '__main__':
+    main()
+
+# --- END OF FILE help_cache.py ---
@@ -0,0 +1,198 @@
+# --- START OF FILE metrics.py ---
+# In-process counters and histograms, shared across gunicorn workers through small
+# per-process snapshot files (one JSON file per pid in METRICS_DIR). /metrics merges
+# every snapshot with this worker's live values and renders the Prometheus text format.
+# All series are counters or histogram buckets, so summing across workers is exact.
+# The gunicorn master clears METRICS_DIR on start and folds each exited worker's file into
+# dead.json (see gunicorn.conf.py), so totals neither double-count nor go backwards.
+# Gauges are read from a callback at scrape time and must already be host-wide.
+
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'quiz_metrics'))
+METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', 5))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# name -> (type, help)
+METRIC_INFO = {
+    "http_requests_total": ("counter", "HTTP requests by route, method and status."),
+    "http_request_duration_seconds": ("histogram", "HTTP request latency by route."),
+    "model_calls_total": ("counter", "Upstream model calls by role, model and outcome."),
+    "model_call_duration_seconds": ("histogram", "Upstream model call latency by role and model."),
+    "model_prompt_tokens_total": ("counter", "Prompt tokens sent to the model."),
+    "model_response_tokens_total": ("counter", "Response tokens received from the model."),
+    "model_call_rejections_total": ("counter", "Model calls rejected locally (no free slot, deadline exceeded)."),
+    "verdict_cache_requests_total": ("counter", "Answer verdict cache lookups by result (hit/miss)."),
+    "help_cache_requests_total": ("counter", "Chatbot help cache lookups by result (hit/miss)."),
+    "answer_grader_resolutions_total": ("counter", "Quiz answers by the grading stage that resolved them."),
+    "answer_batches_total": ("counter", "Batched quiz-model grading calls."),
+    "answer_batch_items_total": ("counter", "Answers graded through batched quiz-model calls."),
+    "admission_requests_total": ("counter", "Admission decisions by priority and outcome (admitted, queued, shed_user, shed_global)."),
+    "admission_wait_seconds": ("histogram", "Time admitted requests spent in the admission queue."),
+    "admission_queue_depth": ("gauge", "Requests waiting in the shared admission queue."),
+    "progress_attempts_total": ("counter", "Quiz attempts persisted to the progress store, or dropped (queue full / write error)."),
+}
+
+logger = logging.getLogger(__name__)
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [bucket counts..., +Inf count, sum]
+_gauges = {}      # name -> callable returning the current host-wide value
+_flusher_pid = None
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def inc(name, amount=1, **labels):
+    _ensure_flusher()
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+def observe(name, value, **labels):
+    _ensure_flusher()
+    key = _key(name, labels)
+    with _lock:
+        series = _histograms.get(key)
+        if series is None:
+            series = _histograms[key] = [0] * (len(LATENCY_BUCKETS) + 2)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound: series[i] += 1
+        series[-2] += 1     # +Inf / count
+        series[-1] += value # sum
+
+def gauge(name, read):
+    """Registers a gauge whose value is read when /metrics is scraped"""
+    _gauges[name] = read
+
+
+# --- Cross-worker aggregation ---
+def _snapshot():
+    with _lock:
+        return {
+            "counters": [[name, list(labels), value] for (name, labels), value in _counters.items()],
+            "histograms": [[name, list(labels), list(series)] for (name, labels), series in _histograms.items()],
+        }
+
+def flush():
+    """Writes this process's snapshot (atomic rename, so readers never see a partial file)"""
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        _write(os.path.join(METRICS_DIR, f"{os.getpid()}.json"), _snapshot())
+    except OSError as e:
+        logger.warning("metrics flush failed", extra={"error": str(e)})
+
+def _flush_loop():
+    while True:
+        time.sleep(METRICS_FLUSH_SECONDS)
+        flush()
+
+def _ensure_flusher():
+    # Started lazily (and again after a fork) so each worker has its own flusher thread
+    global _flusher_pid
+    if _flusher_pid != os.getpid():
+        with _lock:
+            if _flusher_pid != os.getpid():
+                _flusher_pid = os.getpid()
+                threading.Thread(target=_flush_loop, name='metrics-flush', daemon=True).start()
+
+def _read(path):
+    try:
+        with open(path) as f: return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write(path, snapshot):
+    with open(path + ".tmp", 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(path + ".tmp", path)
+
+def clear():
+    """Removes every snapshot file; run by the gunicorn master before any worker starts"""
+    for path in glob.glob(os.path.join(METRICS_DIR, "*.json*")):
+        try: os.remove(path)
+        except OSError: pass
+
+def mark_process_dead(pid):
+    """Folds an exited worker's snapshot into dead.json and removes its file.
+
+    Only the gunicorn master calls this (child_exit), so dead.json has a single writer.
+    A later worker that reuses the pid then starts from an empty file.
+    """
+    path = os.path.join(METRICS_DIR, f"{pid}.json")
+    snapshot = _read(path)
+    if snapshot is None: return
+    dead_path = os.path.join(METRICS_DIR, "dead.json")
+    counters, histograms = _combine([s for s in (_read(dead_path), snapshot) if s])
+    try:
+        _write(dead_path, {
+            "counters": [[name, list(labels), value] for (name, labels), value in counters.items()],
+            "histograms": [[name, list(labels), series] for (name, labels), series in histograms.items()],
+        })
+        os.remove(path)
+    except OSError as e:
+        logger.warning("metrics fold failed", extra={"pid": pid, "error": str(e)})
+
+def _merged():
+    snapshots = []
+    for path in glob.glob(os.path.join(METRICS_DIR, "*.json")):
+        if os.path.basename(path) == f"{os.getpid()}.json": continue # Use live values for this worker
+        snapshot = _read(path)
+        if snapshot is not None: snapshots.append(snapshot)
+    snapshots.append(_snapshot())
+    return _combine(snapshots)
+
+def _combine(snapshots):
+    counters, histograms = {}, {}
+    for snap in snapshots:
+        for name, labels, value in snap["counters"]:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, series in snap["histograms"]:
+            key = (name, tuple(map(tuple, labels)))
+            existing = histograms.get(key)
+            histograms[key] = series if existing is None else [a + b for a, b in zip(existing, series)]
+    return counters, histograms
+
+def _labels_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs: return ""
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+def render_prometheus():
+    counters, histograms = _merged()
+    lines, described = [], set()
+    def describe(name):
+        if name in described: return
+        described.add(name)
+        kind, help_text = METRIC_INFO.get(name, ("untyped", name))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+    for (name, labels), value in sorted(counters.items()):
+        describe(name)
+        lines.append(f"{name}{_labels_text(labels)} {value}")
+    for (name, labels), series in sorted(histograms.items()):
+        describe(name)
+        for bound, count in zip(LATENCY_BUCKETS, series):
+            lines.append(f"{name}_bucket{_labels_text(labels, [('le', bound)])} {count}")
+        lines.append(f"{name}_bucket{_labels_text(labels, [('le', '+Inf')])} {series[-2]}")
+        lines.append(f"{name}_count{_labels_text(labels)} {series[-2]}")
+        lines.append(f"{name}_sum{_labels_text(labels)} {series[-1]}")
+    for name, read in sorted(_gauges.items()):
+        try: value = read()
+        except Exception as e:
+            logger.warning("gauge read failed", extra={"gauge": name, "error": str(e)})
+            continue
+        describe(name)
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+# --- END OF FILE metrics.py ---
@@ -0,0 +1,84 @@
+# --- START OF FILE model_calls.py ---
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+
+import metrics
+
+# --- Configuration ---
+MODEL_CALL_TIMEOUT_SECONDS = float(os.environ.get('MODEL_CALL_TIMEOUT_SECONDS', 15))
+MAX_INFLIGHT_MODEL_CALLS = int(os.environ.get('MAX_INFLIGHT_MODEL_CALLS', 32))
+# How long a request may wait for a free model slot before failing fast
+MODEL_SLOT_WAIT_SECONDS = float(os.environ.get('MODEL_SLOT_WAIT_SECONDS', 2))
+
+_executor = ThreadPoolExecutor(max_workers=MAX_INFLIGHT_MODEL_CALLS, thread_name_prefix='model-call')
+# Released when the upstream call really finishes, even if the caller already timed out,
+# so the cap reflects what this process actually has in flight.
+_slots = threading.BoundedSemaphore(MAX_INFLIGHT_MODEL_CALLS)
+_inflight_lock = threading.Lock()
+_inflight = 0
+
+
+class ModelBusyError(RuntimeError):
+    """Raised when this process already has the maximum number of model calls in flight."""
+
+class ModelTimeoutError(TimeoutError):
+    """Raised when a model call does not finish within its deadline."""
+
+
+def inflight_count():
+    return _inflight
+
+def _run(model, prompt, timeout, kwargs):
+    global _inflight
+    with _inflight_lock: _inflight += 1
+    try:
+        return model.generate_content(prompt, request_options={"timeout": timeout}, **kwargs)
+    finally:
+        with _inflight_lock: _inflight -= 1
+        _slots.release()
+
+def call_model(model, prompt, timeout=None, **kwargs):
+    """Runs model.generate_content on the bounded pool with a deadline.
+
+    Raises ModelBusyError if no slot frees up quickly and ModelTimeoutError if the
+    deadline passes; callers treat both like any other upstream failure.
+    """
+    timeout = timeout or MODEL_CALL_TIMEOUT_SECONDS
+    if not _slots.acquire(timeout=MODEL_SLOT_WAIT_SECONDS):
+        metrics.inc("model_call_rejections_total", reason="busy")
+        raise ModelBusyError(f"Too many model calls in flight (limit {MAX_INFLIGHT_MODEL_CALLS}).")
+    try:
+        future = _executor.submit(_run, model, prompt, timeout, kwargs)
+    except Exception:
+        _slots.release()
+        raise
+    try:
+        return future.result(timeout=timeout)
+    except FuturesTimeoutError:
+        metrics.inc("model_call_rejections_total", reason="timeout")
+        raise ModelTimeoutError(f"Model call exceeded {timeout:g}s deadline.") from None
+
+def stream_model(model, prompt, timeout=None, **kwargs):
+    """Yields text chunks from a streaming generate_content call.
+
+    Runs in the caller's thread (the response is consumed chunk by chunk) but still
+    takes a model slot for its whole duration and passes the deadline to the SDK.
+    """
+    global _inflight
+    timeout = timeout or MODEL_CALL_TIMEOUT_SECONDS
+    if not _slots.acquire(timeout=MODEL_SLOT_WAIT_SECONDS):
+        metrics.inc("model_call_rejections_total", reason="busy")
+        raise ModelBusyError(f"Too many model calls in flight (limit {MAX_INFLIGHT_MODEL_CALLS}).")
+    with _inflight_lock: _inflight += 1
+    try:
+        response = model.generate_content(prompt, stream=True, request_options={"timeout": timeout}, **kwargs)
+        for chunk in response:
+            text = getattr(chunk, 'text', '')
+            if text: yield text
+    finally:
+        with _inflight_lock: _inflight -= 1
+        _slots.release()
+
+# --- END OF FILE model_calls.py ---
@@ -0,0 +1,258 @@
+# --- START OF FILE model_client.py ---
+# Resilient wrapper around the Gemini models. Each ModelClient owns an ordered list of
+# model names (primary first, then fallbacks); the SDK models are only built on first
+# use. Every model has a circuit breaker fed by call outcomes: when upstream is unhealthy
+# calls fail fast (or move to the fallback model) instead of waiting for a timeout, and a
+# single probe call after the cool-down decides whether to close the breaker again.
+
+import collections
+import logging
+import os
+import random
+import threading
+import time
+
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+BREAKER_WINDOW = int(os.environ.get('BREAKER_WINDOW', 20))                 # recent calls considered
+BREAKER_MIN_CALLS = int(os.environ.get('BREAKER_MIN_CALLS', 5))            # before the error rate counts
+BREAKER_ERROR_RATE = float(os.environ.get('BREAKER_ERROR_RATE', 0.5))      # trip above this failure ratio
+BREAKER_COOLDOWN_SECONDS = float(os.environ.get('BREAKER_COOLDOWN_SECONDS', 30))
+RETRY_MAX_ATTEMPTS = int(os.environ.get('RETRY_MAX_ATTEMPTS', 3))
+RETRY_BUDGET_RATIO = float(os.environ.get('RETRY_BUDGET_RATIO', 0.2))      # retries allowed per request
+RETRY_BUDGET_MAX = float(os.environ.get('RETRY_BUDGET_MAX', 10))
+RETRY_BASE_DELAY_SECONDS = 0.25
+RETRY_MAX_DELAY_SECONDS = 2.0
+
+# Upstream conditions worth retrying / counting against a model's health. Anything else
+# (bad request, permission, blocked prompt) is the caller's problem, not the model's.
+TRANSIENT_ERRORS = (
+    google_exceptions.ServiceUnavailable, google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded, google_exceptions.TooManyRequests,
+    google_exceptions.ResourceExhausted, google_exceptions.GatewayTimeout,
+    ConnectionError, TimeoutError,
+)
+
+_configure_lock = threading.Lock()
+_configured = False
+
+
+class ModelUnavailableError(RuntimeError):
+    """Raised immediately when every model of a client has an open breaker."""
+
+
+def configure_genai(api_key):
+    global _configured
+    with _configure_lock:
+        if not _configured:
+            genai.configure(api_key=api_key)
+            _configured = True
+
+
+class CircuitBreaker:
+    """closed -> open (after too many failures) -> half_open (one probe) -> closed/open"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.state = 'closed'
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self.outcomes = collections.deque(maxlen=BREAKER_WINDOW)   # True = success
+        self.latencies = collections.deque(maxlen=BREAKER_WINDOW)
+        self.total_calls = 0
+        self.total_failures = 0
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'open' and time.monotonic() - self.opened_at >= BREAKER_COOLDOWN_SECONDS:
+                self.state = 'half_open'
+            if self.state == 'closed': return True
+            if self.state == 'half_open' and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record(self, success, latency):
+        with self._lock:
+            self.total_calls += 1
+            self.outcomes.append(success)
+            self.latencies.append(latency)
+            if not success: self.total_failures += 1
+            if self.state == 'half_open':
+                self._probe_in_flight = False
+                if success:
+                    self.state = 'closed'
+                    self.outcomes.clear()
+                else:
+                    self._trip()
+            elif self.state == 'closed' and len(self.outcomes) >= BREAKER_MIN_CALLS and self.error_rate() > BREAKER_ERROR_RATE:
+                self._trip()
+
+    def release_probe(self):
+        """Called when an allowed call ended without a health signal (e.g. a bad request)"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _trip(self):
+        self.state = 'open'
+        self.opened_at = time.monotonic()
+
+    def error_rate(self):
+        return (1 - sum(self.outcomes) / len(self.outcomes)) if self.outcomes else 0.0
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            pick = lambda q: round(latencies[min(len(latencies) - 1, int(q * len(latencies)))], 3) if latencies else None
+            return {
+                "state": self.state, "error_rate": round(self.error_rate(), 3),
+                "latency_p50_seconds": pick(0.5), "latency_p95_seconds": pick(0.95),
+                "total_calls": self.total_calls, "total_failures": self.total_failures,
+            }
+
+
+class ModelClient:
+    """Drop-in for a GenerativeModel (exposes generate_content) with breakers, fallbacks and retries.
+
+    model_kwargs (e.g. system_instruction, generation_config) are fixed per client and passed
+    to every GenerativeModel it builds, so per-request prompts carry only variable fields.
+    """
+
+    def __init__(self, role, model_names, api_key, **model_kwargs):
+        self.role = role
+        self.model_names = list(model_names)
+        self.api_key = api_key
+        self.model_kwargs = model_kwargs
+        self.breakers = {name: CircuitBreaker() for name in self.model_names}
+        self._models = {}
+        self._models_lock = threading.Lock()
+        self._budget_lock = threading.Lock()
+        self.retry_budget = RETRY_BUDGET_MAX
+
+    def _model(self, name):
+        model = self._models.get(name)
+        if model is None:
+            with self._models_lock:
+                model = self._models.get(name)
+                if model is None:
+                    configure_genai(self.api_key)
+                    model = self._models[name] = genai.GenerativeModel(name, **self.model_kwargs)
+                    logger.info("model loaded", extra={"role": self.role, "model": name})
+        return model
+
+    def available(self):
+        """False only while every model's breaker is open (and not yet due for a probe)"""
+        return any(b.state != 'open' or time.monotonic() - b.opened_at >= BREAKER_COOLDOWN_SECONDS for b in self.breakers.values())
+
+    def warm_up(self, send_request=False):
+        """Builds the SDK models up front; optionally sends a tiny request to each"""
+        for name in self.model_names:
+            try:
+                self._model(name)
+                if send_request: self.generate_content("ping", _only=name)
+            except Exception as e:
+                logger.warning("model warm-up failed", extra={"role": self.role, "model": name, "error": str(e)})
+
+    def _spend_retry(self):
+        with self._budget_lock:
+            if self.retry_budget < 1: return False
+            self.retry_budget -= 1
+            return True
+
+    def generate_content(self, prompt, _only=None, **kwargs):
+        with self._budget_lock:
+            self.retry_budget = min(RETRY_BUDGET_MAX, self.retry_budget + RETRY_BUDGET_RATIO)
+        timeout = (kwargs.get('request_options') or {}).get('timeout')
+        deadline = time.monotonic() + timeout if timeout else None
+        names = [_only] if _only else self.model_names
+        last_error, failed = None, set()
+
+        for attempt in range(max(1, RETRY_MAX_ATTEMPTS)): # 0 still means one call, just no retries
+            if attempt:
+                delay = random.uniform(0, min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * 2 ** attempt))
+                if deadline and time.monotonic() + delay >= deadline: break
+                if not self._spend_retry(): break
+                time.sleep(delay)
+            # Prefer a healthy model that hasn't failed this request yet
+            candidates = [n for n in names if n not in failed] + [n for n in names if n in failed]
+            name = next((n for n in candidates if self.breakers[n].allow()), None)
+            if name is None:
+                if last_error: break
+                raise ModelUnavailableError(f"All {self.role} models are temporarily unavailable.")
+            if deadline: # Later attempts only get what is left of the caller's deadline
+                kwargs['request_options'] = {**kwargs['request_options'], 'timeout': max(0.1, deadline - time.monotonic())}
+            started = time.monotonic()
+            try:
+                response = self._model(name).generate_content(prompt, **kwargs)
+            except TRANSIENT_ERRORS as e:
+                self._record(name, False, time.monotonic() - started, "transient_error")
+                logger.warning("model call failed", extra={"role": self.role, "model": name, "attempt": attempt + 1, "error": str(e)})
+                last_error = e
+                failed.add(name)
+                continue
+            except Exception:
+                self.breakers[name].release_probe()
+                metrics.inc("model_calls_total", role=self.role, model=name, outcome="client_error")
+                raise
+            # A stream can still fail after its first chunk; its outcome is recorded when it ends
+            if kwargs.get('stream'): return self._stream(name, response, started)
+            self._record(name, True, time.monotonic() - started, "success")
+            self._count_tokens(name, response)
+            return response
+        raise last_error
+
+    def _record(self, name, success, latency, outcome):
+        self.breakers[name].record(success, latency)
+        metrics.inc("model_calls_total", role=self.role, model=name, outcome=outcome)
+        metrics.observe("model_call_duration_seconds", latency, role=self.role, model=name)
+
+    def _count_tokens(self, name, response):
+        usage = getattr(response, 'usage_metadata', None)
+        if not usage: return
+        prompt_tokens = getattr(usage, 'prompt_token_count', 0) or 0
+        response_tokens = getattr(usage, 'candidates_token_count', 0) or 0
+        metrics.inc("model_prompt_tokens_total", prompt_tokens, role=self.role, model=name)
+        metrics.inc("model_response_tokens_total", response_tokens, role=self.role, model=name)
+        # One line per call so prompt changes can be checked against real token counts
+        logger.info("model tokens", extra={"role": self.role, "model": name, "prompt_tokens": prompt_tokens,
+                                           "response_tokens": response_tokens, "total_tokens": getattr(usage, 'total_token_count', 0) or 0})
+
+    def _stream(self, name, response, started):
+        """Passes stream chunks through, recording the call only once the stream has ended.
+
+        Mid-stream upstream errors count against the model's breaker; a stream the consumer
+        abandons gives no health signal. The last chunk carries the usage totals.
+        """
+        last = None
+        try:
+            for chunk in response:
+                last = chunk
+                yield chunk
+        except TRANSIENT_ERRORS as e:
+            self._record(name, False, time.monotonic() - started, "transient_error")
+            logger.warning("model stream failed", extra={"role": self.role, "model": name, "error": str(e)})
+            raise
+        except GeneratorExit:
+            self.breakers[name].release_probe()
+            raise
+        except Exception:
+            self.breakers[name].release_probe()
+            metrics.inc("model_calls_total", role=self.role, model=name, outcome="client_error")
+            raise
+        self._record(name, True, time.monotonic() - started, "success")
+        if last is not None: self._count_tokens(name, last)
+
+    def health(self):
+        return {
+            "available": self.available(),
+            "retry_budget": round(self.retry_budget, 2),
+            "models": {name: breaker.snapshot() for name, breaker in self.breakers.items()},
+        }
+
+# --- END OF FILE model_client.py ---
@@ -0,0 +1,267 @@
+# --- START OF FILE progress_store.py ---
+# Persistent quiz progress: every graded attempt is recorded per user and question in a
+# SQLite (WAL) file shared by all workers on the host. Request handlers only append to
+# an in-memory queue. A background thread writes the queue in batches, then folds rows
+# written by any worker since its last pass into in-memory aggregates (per-question
+# accuracy, top scores), so the leaderboard is served without touching disk.
+# A user's score is the number of distinct questions they have answered correctly, so
+# repeating a known answer doesn't climb the leaderboard; their accuracy is correct
+# attempts over all attempts.
+
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import metrics
+from sqlite_local import LocalConnection
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+PROGRESS_DB_PATH = os.environ.get('PROGRESS_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'progress.sqlite3'))
+PROGRESS_FLUSH_SECONDS = float(os.environ.get('PROGRESS_FLUSH_SECONDS', 1))
+PROGRESS_BATCH_SIZE = int(os.environ.get('PROGRESS_BATCH_SIZE', 500))
+PROGRESS_QUEUE_SIZE = int(os.environ.get('PROGRESS_QUEUE_SIZE', 50000))  # attempts held in memory before dropping
+LEADERBOARD_SIZE = int(os.environ.get('LEADERBOARD_SIZE', 100))
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS attempts ('
+    ' id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, question_id INTEGER NOT NULL,'
+    ' is_correct INTEGER NOT NULL, created_at REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS attempts_user ON attempts (user_id, question_id)',
+    'CREATE TABLE IF NOT EXISTS user_stats ('
+    ' user_id TEXT PRIMARY KEY, attempts INTEGER NOT NULL, correct_attempts INTEGER NOT NULL,'
+    ' correct INTEGER NOT NULL, updated_at REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS user_stats_score ON user_stats (correct DESC, attempts)',
+    'CREATE TABLE IF NOT EXISTS question_stats ('
+    ' question_id INTEGER PRIMARY KEY, attempts INTEGER NOT NULL, correct INTEGER NOT NULL)',
+    # First correct answer per (user, question); user_stats.correct counts these rows
+    'CREATE TABLE IF NOT EXISTS solved ('
+    ' user_id TEXT NOT NULL, question_id INTEGER NOT NULL, PRIMARY KEY (user_id, question_id)) WITHOUT ROWID',
+)
+
+
+def _score_key(row):
+    """Leaderboard order: most correct answers first, then fewest attempts"""
+    return (-row["correct"], row["attempts"])
+
+def _user_row(attempts, correct_attempts, correct):
+    return {"attempts": attempts, "correct_attempts": correct_attempts, "correct": correct}
+
+def _accuracy(correct_attempts, attempts):
+    return round(correct_attempts / attempts, 3) if attempts else 0.0
+
+
+class ProgressStore:
+    """Write-behind attempt log with incrementally refreshed aggregates.
+
+    record_attempt() never blocks: it enqueues, and a full queue drops the attempt (counted
+    in metrics) rather than slowing a request. Aggregates lag writes by about one flush.
+    """
+
+    def __init__(self, path=PROGRESS_DB_PATH, flush_seconds=PROGRESS_FLUSH_SECONDS,
+                 batch_size=PROGRESS_BATCH_SIZE, leaderboard_size=LEADERBOARD_SIZE):
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+        self.leaderboard_size = leaderboard_size
+        self._queue = queue.Queue(maxsize=PROGRESS_QUEUE_SIZE)
+        self._connect = LocalConnection(path, timeout=10)
+        self._lock = threading.Lock()      # guards the aggregates below
+        self._flush_lock = threading.Lock()
+        self._question_stats = {}          # question_id -> [attempts, correct]
+        self._top = {}                     # user_id -> {"attempts", "correct_attempts", "correct"}; top scores only
+        self._last_seen_id = 0
+        self._loaded = False
+        self.refreshed_at = None
+        self._writer_pid = None
+        self._ensure_schema()
+        atexit.register(self.flush) # Don't lose queued attempts on a clean shutdown
+
+    def _ensure_schema(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = self._connect()
+        for statement in SCHEMA:
+            conn.execute(statement)
+
+    def _ensure_writer(self):
+        # Started lazily (and again after a fork) so each worker has its own writer thread
+        if self._writer_pid != os.getpid():
+            with self._flush_lock:
+                if self._writer_pid != os.getpid():
+                    self._writer_pid = os.getpid()
+                    threading.Thread(target=self._write_loop, name='progress-writer', daemon=True).start()
+
+    # --- Write path ---
+    def record_attempt(self, user_id, question_id, is_correct):
+        if not user_id: return
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait((str(user_id), int(question_id), 1 if is_correct else 0, time.time()))
+        except queue.Full:
+            metrics.inc("progress_attempts_total", outcome="dropped")
+
+    def _write_loop(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            try:
+                self.flush()
+                self.refresh()
+            except Exception as e: # Keep the writer alive; the next pass retries
+                logger.warning("progress store pass failed", extra={"error": str(e)})
+
+    def flush(self):
+        """Writes everything queued so far, in transactions of up to batch_size attempts"""
+        with self._flush_lock:
+            while True:
+                batch = []
+                while len(batch) < self.batch_size:
+                    try: batch.append(self._queue.get_nowait())
+                    except queue.Empty: break
+                if not batch: return
+                try:
+                    self._write_batch(batch)
+                except sqlite3.Error as e:
+                    logger.warning("progress flush failed; attempts dropped", extra={"error": str(e), "attempts": len(batch)})
+                    metrics.inc("progress_attempts_total", len(batch), outcome="dropped")
+                    return
+                metrics.inc("progress_attempts_total", len(batch), outcome="written")
+
+    def _write_batch(self, batch):
+        users, questions = {}, {}
+        for user_id, question_id, is_correct, _ in batch:
+            u = users.setdefault(user_id, [0, 0, 0]); u[0] += 1; u[1] += is_correct
+            q = questions.setdefault(question_id, [0, 0]); q[0] += 1; q[1] += is_correct
+        now = time.time()
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany('INSERT INTO attempts (user_id, question_id, is_correct, created_at) VALUES (?, ?, ?, ?)', batch)
+            # Only a user's first correct answer to a question scores
+            for user_id, question_id in {(u, q) for u, q, is_correct, _ in batch if is_correct}:
+                if conn.execute('INSERT OR IGNORE INTO solved (user_id, question_id) VALUES (?, ?)', (user_id, question_id)).rowcount:
+                    users[user_id][2] += 1
+            conn.executemany(
+                'INSERT INTO user_stats (user_id, attempts, correct_attempts, correct, updated_at) VALUES (?, ?, ?, ?, ?)'
+                ' ON CONFLICT(user_id) DO UPDATE SET attempts = attempts + excluded.attempts,'
+                ' correct_attempts = correct_attempts + excluded.correct_attempts,'
+                ' correct = correct + excluded.correct, updated_at = excluded.updated_at',
+                [(user_id, a, ca, c, now) for user_id, (a, ca, c) in users.items()])
+            conn.executemany(
+                'INSERT INTO question_stats (question_id, attempts, correct) VALUES (?, ?, ?)'
+                ' ON CONFLICT(question_id) DO UPDATE SET attempts = attempts + excluded.attempts,'
+                ' correct = correct + excluded.correct',
+                [(question_id, a, c) for question_id, (a, c) in questions.items()])
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    # --- Aggregates ---
+    def refresh(self):
+        """Folds attempts written by any worker since the last pass into the in-memory aggregates"""
+        conn = self._connect()
+        if not self._loaded:
+            self._load(conn)
+            return
+        rows = conn.execute('SELECT id, user_id, question_id, is_correct FROM attempts WHERE id > ? ORDER BY id',
+                            (self._last_seen_id,)).fetchall()
+        if not rows:
+            self.refreshed_at = time.time()
+            return
+        question_deltas, changed_users = {}, set()
+        for _, user_id, question_id, is_correct in rows:
+            d = question_deltas.setdefault(question_id, [0, 0]); d[0] += 1; d[1] += is_correct
+            changed_users.add(user_id)
+        changed = []
+        users = list(changed_users)
+        for start in range(0, len(users), 500):
+            chunk = users[start:start + 500]
+            changed += conn.execute(
+                f'SELECT user_id, attempts, correct_attempts, correct FROM user_stats WHERE user_id IN ({",".join("?" * len(chunk))})',
+                chunk).fetchall()
+        with self._lock:
+            current = dict(self._top)
+        # Re-reading the changed users keeps the top list exact while kept users only move up.
+        # A kept user whose rank fell (more attempts, no new question) may now be outranked
+        # by someone we never kept, so then the top list is re-read from the score index.
+        fell = any(user_id in current and _score_key(_user_row(*stats)) > _score_key(current[user_id])
+                   for user_id, *stats in changed)
+        top_rows = self._read_top(conn) if fell and len(current) >= self.leaderboard_size else None
+        with self._lock:
+            for question_id, (a, c) in question_deltas.items():
+                stats = self._question_stats.setdefault(question_id, [0, 0])
+                stats[0] += a; stats[1] += c
+            if top_rows is not None:
+                self._top = {user_id: _user_row(*stats) for user_id, *stats in top_rows}
+            for user_id, *stats in changed:
+                self._top[user_id] = _user_row(*stats)
+            self._trim_top()
+            self._last_seen_id = rows[-1][0]
+            self.refreshed_at = time.time()
+
+    def _read_top(self, conn):
+        return conn.execute('SELECT user_id, attempts, correct_attempts, correct FROM user_stats'
+                            ' ORDER BY correct DESC, attempts LIMIT ?', (self.leaderboard_size,)).fetchall()
+
+    def _load(self, conn):
+        conn.execute('BEGIN') # One read snapshot, so the totals and last_id agree
+        try:
+            last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM attempts').fetchone()[0]
+            question_rows = conn.execute('SELECT question_id, attempts, correct FROM question_stats').fetchall()
+            top_rows = self._read_top(conn)
+        finally:
+            conn.execute('COMMIT')
+        with self._lock:
+            self._question_stats = {q: [a, c] for q, a, c in question_rows}
+            self._top = {user_id: _user_row(*stats) for user_id, *stats in top_rows}
+            self._last_seen_id = last_id
+            self._loaded = True
+            self.refreshed_at = time.time()
+
+    def _trim_top(self):
+        # Caller holds the lock
+        if len(self._top) <= self.leaderboard_size: return
+        keep = sorted(self._top.items(), key=lambda item: _score_key(item[1]))[:self.leaderboard_size]
+        self._top = dict(keep)
+
+    # --- Reads (served from memory) ---
+    def _ensure_loaded(self):
+        self._ensure_writer()
+        if not self._loaded:
+            try: self.refresh() # First read in this worker: load the aggregates once
+            except sqlite3.Error as e: logger.warning("progress aggregates load failed", extra={"error": str(e)})
+
+    def leaderboard(self, limit=10):
+        self._ensure_loaded()
+        with self._lock:
+            ranked = sorted(self._top.items(), key=lambda item: _score_key(item[1]))[:limit]
+        return [{"rank": rank, "user_id": user_id, "correct": s["correct"], "attempts": s["attempts"],
+                 "accuracy": _accuracy(s["correct_attempts"], s["attempts"])}
+                for rank, (user_id, s) in enumerate(ranked, 1)]
+
+    def question_accuracy(self):
+        self._ensure_loaded()
+        with self._lock:
+            return {question_id: {"attempts": a, "correct": c, "accuracy": round(c / a, 3) if a else 0.0}
+                    for question_id, (a, c) in sorted(self._question_stats.items())}
+
+    def user_stats(self, user_id):
+        """Lifetime totals for one user (a single primary-key read, not on the answer path)"""
+        try:
+            row = self._connect().execute('SELECT attempts, correct_attempts, correct FROM user_stats WHERE user_id = ?',
+                                          (user_id,)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("progress read failed", extra={"error": str(e)})
+            row = None
+        attempts, correct_attempts, correct = row or (0, 0, 0)
+        return {"attempts": attempts, "correct": correct, "accuracy": _accuracy(correct_attempts, attempts)}
+
+    def pending(self):
+        return self._queue.qsize()
+
+# --- END OF FILE progress_store.py ---
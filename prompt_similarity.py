@@ -0,0 +1,137 @@
+# --- START OF FILE prompt_similarity.py ---
+# Local similarity scoring for "Guess the Prompt". Each original prompt is turned into a
+# hashed TF-IDF vector (word unigrams/bigrams + character trigrams) once at startup; a
+# guess is scored with a NumPy cosine similarity, so most guesses never reach the model.
+
+import argparse
+import json
+import os
+import re
+import zlib
+from collections.abc import Hashable
+
+import numpy as np
+
+# --- Configuration ---
+HASH_DIMENSIONS = int(os.environ.get('PROMPT_SIM_DIMENSIONS', 4096))
+# Score >= VERY is "Very Similar", >= SOMEWHAT is "Somewhat Similar", else "Not Similar".
+# Defaults come from `python prompt_similarity.py data/prompt_guesses_labelled.jsonl --calibrate`
+# (VERY as suggested; SOMEWHAT ties 0.05 there and is kept clear of the many near-zero scores).
+PROMPT_SIM_VERY = float(os.environ.get('PROMPT_SIM_VERY', 0.46))
+PROMPT_SIM_SOMEWHAT = float(os.environ.get('PROMPT_SIM_SOMEWHAT', 0.10))
+# Scores this close to either threshold are borderline and get a second opinion from the model
+PROMPT_SIM_MARGIN = float(os.environ.get('PROMPT_SIM_MARGIN', 0.05))
+
+RATINGS = ["Very Similar", "Somewhat Similar", "Not Similar"]
+STOPWORDS = {"a", "an", "the", "of", "to", "in", "on", "for", "about", "and", "or", "is", "by", "with", "that", "this"}
+
+
+def _features(text, dimensions=HASH_DIMENSIONS):
+    """Hashed feature ids for one text: word unigrams, word bigrams and char trigrams"""
+    words = [w for w in re.findall(r"[a-z0-9']+", (text or '').casefold()) if w not in STOPWORDS]
+    feats = [f"w:{w}" for w in words]
+    feats += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f" {w} "
+        feats += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    # crc32 is stable across processes (unlike hash()), so vectors match in every worker
+    return np.fromiter((zlib.crc32(f.encode()) % dimensions for f in feats), dtype=np.int64, count=len(feats))
+
+def _term_counts(texts, dimensions=HASH_DIMENSIONS):
+    matrix = np.zeros((len(texts), dimensions), dtype=np.float32)
+    for row, text in enumerate(texts):
+        np.add.at(matrix[row], _features(text, dimensions), 1.0)
+    return matrix
+
+def embed_texts(texts, dimensions=HASH_DIMENSIONS):
+    """Unit-length log-scaled hashed n-gram vectors (no IDF), for corpora that grow at runtime"""
+    return PromptSimilarity._normalize(np.log1p(_term_counts(texts, dimensions)))
+
+
+class PromptSimilarity:
+    """Precomputed TF-IDF vectors for a set of original prompts, keyed by content id."""
+
+    def __init__(self, prompts, very=PROMPT_SIM_VERY, somewhat=PROMPT_SIM_SOMEWHAT, margin=PROMPT_SIM_MARGIN):
+        """prompts: mapping of content id -> original prompt text"""
+        self.very, self.somewhat, self.margin = very, somewhat, margin
+        self.row_of = {content_id: row for row, content_id in enumerate(prompts)}
+        counts = _term_counts(list(prompts.values()))
+        document_freq = (counts > 0).sum(axis=0)
+        self.idf = (np.log((1 + len(prompts)) / (1 + document_freq)) + 1).astype(np.float32)
+        self.vectors = self._normalize(np.log1p(counts) * self.idf)
+
+    @staticmethod
+    def _normalize(matrix):
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+    def score_batch(self, pairs):
+        """Cosine similarity for many (content_id, guess) pairs at once; unknown (or unhashable) ids score NaN"""
+        rows = np.array([self.row_of.get(content_id, -1) if isinstance(content_id, Hashable) else -1
+                         for content_id, _ in pairs], dtype=np.int64)
+        guesses = self._normalize(np.log1p(_term_counts([guess for _, guess in pairs])) * self.idf)
+        scores = np.einsum('ij,ij->i', guesses, self.vectors[np.maximum(rows, 0)]) if len(pairs) else np.zeros(0)
+        return np.where(rows >= 0, scores, np.nan)
+
+    def score(self, content_id, guess):
+        return float(self.score_batch([(content_id, guess)])[0])
+
+    def rate(self, score):
+        """Returns (rating, is_borderline) for a similarity score"""
+        rating = RATINGS[0] if score >= self.very else RATINGS[1] if score >= self.somewhat else RATINGS[2]
+        borderline = bool(abs(score - self.very) < self.margin or abs(score - self.somewhat) < self.margin)
+        return rating, borderline
+
+
+def explain_rating(rating, score):
+    """Short feedback text for a locally scored guess"""
+    messages = {
+        "Very Similar": "Your guess captures the main subject and intent of the original prompt.",
+        "Somewhat Similar": "Your guess shares some key ideas with the original prompt but misses or changes others.",
+        "Not Similar": "Your guess focuses on a different subject or task than the original prompt."
+    }
+    return f"{messages[rating]} (Similarity score: {score:.2f})"
+
+def calibrate(scores, labels):
+    """Picks (very, somewhat) thresholds that best reproduce labelled ratings.
+
+    scores: similarity scores; labels: the rating each guess should get (e.g. from logged
+    model evaluations or manual review). Exhaustive search over a 0.01 grid.
+    """
+    scores, labels = np.asarray(scores, dtype=np.float32), np.asarray(labels)
+    grid = np.round(np.arange(0.0, 1.0, 0.01), 2)
+    best = (PROMPT_SIM_VERY, PROMPT_SIM_SOMEWHAT, -1.0)
+    for somewhat in grid:
+        for very in grid[grid > somewhat]:
+            predicted = np.where(scores >= very, RATINGS[0], np.where(scores >= somewhat, RATINGS[1], RATINGS[2]))
+            accuracy = float((predicted == labels).mean())
+            if accuracy > best[2]: best = (float(very), float(somewhat), accuracy)
+    return best
+
+
+# --- CLI: replay logged guesses / calibrate thresholds ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score logged prompt guesses locally and optionally calibrate thresholds.")
+    parser.add_argument('guesses', help="JSONL file with original_prompt, user_guess and optional similarity (label) per line")
+    parser.add_argument('--calibrate', action='store_true', help="Suggest thresholds from the labelled lines")
+    args = parser.parse_args(argv)
+
+    with open(args.guesses, encoding='utf-8') as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    prompts = {row["original_prompt"]: row["original_prompt"] for row in rows}
+    engine = PromptSimilarity(prompts)
+    scores = engine.score_batch([(row["original_prompt"], row["user_guess"]) for row in rows])
+    for row, score in zip(rows, scores):
+        rating, borderline = engine.rate(score)
+        print(json.dumps({"user_guess": row["user_guess"], "score": round(float(score), 3), "rating": rating,
+                          "borderline": borderline, "label": row.get("similarity")}))
+
+    labelled = [(score, row["similarity"]) for row, score in zip(rows, scores) if row.get("similarity") in RATINGS]
+    if args.calibrate and labelled:
+        very, somewhat, accuracy = calibrate(*zip(*labelled))
+        print(f"Suggested thresholds: PROMPT_SIM_VERY={very:.2f} PROMPT_SIM_SOMEWHAT={somewhat:.2f} (accuracy {accuracy:.1%} on {len(labelled)} labelled guesses)")
+
+if __name__ == '__main__':
+    main()
+
+# --- END OF FILE prompt_similarity.py ---
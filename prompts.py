@@ -0,0 +1,112 @@
+# --- START OF FILE prompts.py ---
+# Fixed instructions and output schemas for each model task. They are attached once, when
+# a ModelClient builds its SDK model (system_instruction + generation_config), so each
+# request only carries its variable fields. Grading and guess evaluation return JSON that
+# matches a schema, so nothing here depends on how the model phrases free text.
+
+import json
+
+from prompt_similarity import RATINGS
+
+# --- Answer grading (batched, see batch_grader.py) ---
+GRADING_INSTRUCTIONS = """You grade answers to quiz questions about AI.
+The user message is a JSON array of items, each with "item", "question", "correct_answer" and "user_answer". Grade every item independently; one item never affects another.
+- "correct": the user's answer means the same as the correct answer and accurately answers the question. Judge the meaning, not keyword matches.
+- "correct_with_typo": as "correct", but the answer has a spelling error.
+- "incorrect": the answer is wrong, does not answer the question, or is irrelevant. Give one concise sentence explaining the key concept the user missed.
+Return exactly one result per item. Leave "explanation" empty unless the verdict is "incorrect". No disclaimers or extra details."""
+
+GRADING_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "item": {"type": "integer"},
+            "verdict": {"type": "string", "format": "enum", "enum": ["correct", "correct_with_typo", "incorrect"]},
+            "explanation": {"type": "string"},
+        },
+        "required": ["item", "verdict"],
+    },
+}
+
+# --- Chatbot help (streamed plain text) ---
+HELP_INSTRUCTIONS = """You help a student with a quiz question about AI.
+Each message gives the quiz question, its correct answer (for context only: never reveal it directly) and the student's request.
+Answer the request concisely, clarifying the concepts related to the question without giving the answer away. Be helpful and encouraging."""
+
+# --- Guess the Prompt evaluation ---
+GUESS_INSTRUCTIONS = f"""You judge the game "Guess the Prompt": a player saw an AI-generated output and guessed the prompt that produced it.
+Each message is a JSON object with "original_prompt" and "guessed_prompt". Compare their intent, subject and requested form.
+Rate the guess as one of: {", ".join(f'"{r}"' for r in RATINGS)}, and explain the rating in one brief sentence."""
+
+GUESS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "similarity": {"type": "string", "format": "enum", "enum": list(RATINGS)},
+        "explanation": {"type": "string"},
+    },
+    "required": ["similarity", "explanation"],
+}
+
+def _json_output(schema):
+    return {"response_mime_type": "application/json", "response_schema": schema}
+
+# ModelClient keyword arguments per task
+GRADING_MODEL_CONFIG = {"system_instruction": GRADING_INSTRUCTIONS, "generation_config": _json_output(GRADING_SCHEMA)}
+HELP_MODEL_CONFIG = {"system_instruction": HELP_INSTRUCTIONS}
+GUESS_MODEL_CONFIG = {"system_instruction": GUESS_INSTRUCTIONS, "generation_config": _json_output(GUESS_SCHEMA)}
+
+
+def _compact_json(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+def grading_request(items):
+    """items: [(question_obj, user_answer), ...]; JSON-encoded so answers can't break the layout"""
+    return _compact_json([{"item": n, "question": q["question"], "correct_answer": q["answer"], "user_answer": answer}
+                          for n, (q, answer) in enumerate(items, 1)])
+
+def help_request(question_obj, help_question):
+    return (f"Quiz question: {question_obj['question']}\n"
+            f"Correct answer (do not reveal): {question_obj['answer']}\n"
+            f"Student's request: {help_question}")
+
+def guess_request(original_prompt, user_guess):
+    return _compact_json({"original_prompt": original_prompt, "guessed_prompt": user_guess})
+
+
+def _load_json(raw):
+    try:
+        return json.loads(raw or "")
+    except ValueError:
+        return None
+
+def verdict_feedback(entry, correct_answer):
+    """Maps one structured verdict to (is_correct, feedback, cacheable), in the app's feedback wording"""
+    verdict = entry.get("verdict") if isinstance(entry, dict) else None
+    if verdict == "correct":
+        return True, "Correct!", True
+    if verdict == "correct_with_typo":
+        return True, f"Correct [spelling error, Correct spelling: '{correct_answer}']", True
+    if verdict == "incorrect":
+        explanation = str(entry.get("explanation") or "").strip()
+        return False, f"Incorrect. The correct answer is: '{correct_answer}'. {explanation}".strip(), True
+    # Missing or malformed entries are not cached so the next attempt gets a fresh evaluation
+    return False, f"Incorrect. The correct answer is: '{correct_answer}'. (AI response format unexpected)", False
+
+def parse_grading(raw, items):
+    """Returns one (is_correct, feedback, cacheable) per item, matched by item number"""
+    entries = _load_json(raw)
+    by_item = {}
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict): continue
+        try: by_item[int(entry.get("item"))] = entry
+        except (TypeError, ValueError): continue
+    return [verdict_feedback(by_item.get(n), q["answer"]) for n, (q, _) in enumerate(items, 1)]
+
+def parse_guess(raw):
+    """Returns (rating, explanation), or None if the reply doesn't match the schema"""
+    result = _load_json(raw)
+    if not isinstance(result, dict) or result.get("similarity") not in RATINGS: return None
+    return result["similarity"], str(result.get("explanation") or "").strip()
+
+# --- END OF FILE prompts.py ---
@@ -0,0 +1,194 @@
+# --- START OF FILE question_bank.py ---
+# File-backed question bank. The JSONL file is only indexed at load time (id -> byte
+# range, plus category/difficulty position lists); question records are read with pread
+# and parsed on demand. Pages of the file are shared between gunicorn workers through
+# the OS page cache, so per-worker memory stays small even for very large banks.
+#
+# Updates must replace the file atomically (write a temp file, then rename it over the
+# old one): open handles keep reading the old version until the reload picks up the new
+# inode. Edits made in place are detected when a read comes back inconsistent, and the
+# bank reloads immediately.
+
+import bisect
+import functools
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from array import array
+
+logger = logging.getLogger(__name__)
+
+QUESTION_BANK_PATH = os.environ.get('QUESTION_BANK_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'questions.jsonl'))
+# How often (seconds) to stat the file for changes; 0 disables hot reload
+QUESTION_BANK_RELOAD_SECONDS = float(os.environ.get('QUESTION_BANK_RELOAD_SECONDS', 5))
+QUESTION_BANK_RECORD_CACHE = int(os.environ.get('QUESTION_BANK_RECORD_CACHE', 1024))
+
+
+def question_version(record):
+    """Short digest of the fields a cached verdict or help reply depends on.
+
+    Caches key on it, so fixing a question's answer or aliases invalidates them at once.
+    """
+    fields = [record.get("question"), record.get("answer"), sorted(record.get("aliases") or [])]
+    return hashlib.sha1(json.dumps(fields, ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+
+def file_signature(stat):
+    """Changes whenever the file is replaced (new inode) or rewritten"""
+    return (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+class BankChangedError(Exception):
+    """A record read didn't match the index: the file was changed in place"""
+
+
+class _BankIndex:
+    """Immutable snapshot of one version of the bank file; swapped wholesale on reload."""
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = array('Q')          # position -> byte offset of the record's line
+        self.lengths = array('I')          # position -> length of the record's line
+        self.ids = array('q')              # position -> question id
+        self.positions = {}                # question id -> position
+        self.by_category = {}              # category -> sorted positions
+        self.by_difficulty = {}            # difficulty -> sorted positions
+        self.combined = {}                 # (category, difficulty) -> intersected positions
+        # The handle pins this version of the file: after an atomic replace it still reads the old inode
+        self._file = open(path, 'rb')
+        self.signature = file_signature(os.fstat(self._file.fileno()))
+        offset = 0
+        for line in self._file:
+            if line.strip():
+                record = json.loads(line)
+                position = len(self.ids)
+                if record["id"] in self.positions:
+                    raise ValueError(f"Duplicate question id {record['id']} in {path}")
+                self.offsets.append(offset)
+                self.lengths.append(len(line))
+                self.ids.append(record["id"])
+                self.positions[record["id"]] = position
+                self.by_category.setdefault(record.get("category"), array('I')).append(position)
+                self.by_difficulty.setdefault(record.get("difficulty"), array('I')).append(position)
+            offset += len(line)
+
+    def read(self, position):
+        # pread (not mmap): a file truncated underneath us gives a short read instead of SIGBUS
+        line = os.pread(self._file.fileno(), self.lengths[position], self.offsets[position])
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if not isinstance(record, dict) or record.get("id") != self.ids[position]:
+            raise BankChangedError(f"{self.path} changed in place (position {position})")
+        return record
+
+
+class QuestionBank:
+    """Question lookup by id (O(1)) or by position within an optionally filtered pool."""
+
+    def __init__(self, path=QUESTION_BANK_PATH, reload_seconds=QUESTION_BANK_RELOAD_SECONDS):
+        self.path = path
+        self.reload_seconds = reload_seconds
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self._load()
+
+    def _load(self):
+        index = _BankIndex(self.path)
+        # Parsed records are cached per index snapshot, so a reload drops stale entries
+        index.record = functools.lru_cache(maxsize=QUESTION_BANK_RECORD_CACHE)(index.read)
+        self._index = index
+        logger.info("question bank loaded", extra={"questions": len(index.ids), "path": self.path})
+
+    def _reload_if_changed(self):
+        # Caller holds the lock
+        try:
+            if file_signature(os.stat(self.path)) != self._index.signature:
+                self._load()
+        except (OSError, ValueError) as e:
+            # Keep serving the last good version if the new file is missing/broken
+            logger.warning("question bank reload failed, keeping previous version", extra={"error": str(e)})
+
+    def _current(self):
+        if self.reload_seconds and time.monotonic() >= self._next_check:
+            with self._lock:
+                if time.monotonic() >= self._next_check:
+                    self._next_check = time.monotonic() + self.reload_seconds
+                    self._reload_if_changed()
+        return self._index
+
+    def _read(self, index, lookup):
+        """Reads lookup(index)'s record; if the file was edited in place, reloads and retries once"""
+        position = lookup(index)
+        if position is None: return None
+        try:
+            return index.record(position)
+        except (OSError, BankChangedError) as e:
+            logger.warning("question bank changed in place; replace it atomically instead", extra={"error": str(e)})
+        with self._lock:
+            if self._index is index:
+                self._reload_if_changed()
+            index = self._index
+        position = lookup(index)
+        if position is None: return None
+        try:
+            return index.record(position)
+        except (OSError, BankChangedError):
+            return None # Still mid-edit; callers treat it like a missing question
+
+    # --- Whole-bank lookups ---
+    def __len__(self):
+        return len(self._current().ids)
+
+    def get(self, question_id):
+        """Returns the question record for an id, or None"""
+        return self._read(self._current(), lambda index: index.positions.get(question_id))
+
+    def categories(self):
+        index = self._current()
+        return {
+            "categories": {k: len(v) for k, v in index.by_category.items() if k is not None},
+            "difficulties": {k: len(v) for k, v in index.by_difficulty.items() if k is not None}
+        }
+
+    # --- Filtered pools (category and/or difficulty) ---
+    def _pool(self, index, category=None, difficulty=None):
+        """Sorted bank positions matching the filters; None means the whole bank"""
+        pools = []
+        if category: pools.append(index.by_category.get(category, array('I')))
+        if difficulty: pools.append(index.by_difficulty.get(difficulty, array('I')))
+        if not pools: return None
+        if len(pools) == 1: return pools[0]
+        key = (category, difficulty)
+        if key not in index.combined:
+            other = set(pools[1])
+            index.combined[key] = array('I', (p for p in pools[0] if p in other))
+        return index.combined[key]
+
+    def pool_size(self, category=None, difficulty=None):
+        index = self._current()
+        pool = self._pool(index, category, difficulty)
+        return len(index.ids) if pool is None else len(pool)
+
+    def question_in_pool(self, pool_position, category=None, difficulty=None):
+        """The record at a pool position, or None if the position is past the pool's end"""
+        def lookup(index):
+            pool = self._pool(index, category, difficulty)
+            size = len(index.ids) if pool is None else len(pool)
+            if not 0 <= pool_position < size: return None
+            return pool_position if pool is None else pool[pool_position]
+        return self._read(self._current(), lookup)
+
+    def pool_position_of(self, question_id, category=None, difficulty=None):
+        """Position of a question inside the filtered pool, or None if it isn't in it"""
+        index = self._current()
+        position = index.positions.get(question_id)
+        pool = self._pool(index, category, difficulty)
+        if position is None or pool is None: return position
+        i = bisect.bisect_left(pool, position)
+        return i if i < len(pool) and pool[i] == position else None
+
+# --- END OF FILE question_bank.py ---
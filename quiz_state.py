@@ -0,0 +1,146 @@
+# --- START OF FILE quiz_state.py ---
+# Compact per-user quiz state. The session only stores a shuffle seed, the current
+# position, counters and the answered positions as a short list of ranges; question data
+# is always resolved against the shared bank, so the cookie doesn't grow with the bank.
+
+import base64
+import bisect
+import os
+import random
+
+FEISTEL_ROUNDS = 4
+# Answered positions are kept as at most this many ranges (a few hundred bytes of cookie)
+QUIZ_ANSWERED_MAX_RUNS = int(os.environ.get('QUIZ_ANSWERED_MAX_RUNS', 64))
+
+
+def new_quiz_state():
+    return {
+        'seed': random.getrandbits(32), 'index': 0, 'answered_runs': '', 'completed': 0,
+        'correct_answers': 0, 'total_attempts': 0
+    }
+
+def is_compact_state(state):
+    return isinstance(state, dict) and 'seed' in state
+
+
+# --- Seeded permutation of bank positions ---
+# A small Feistel network over the next even power of two, with cycle-walking to stay
+# inside [0, size). Any position maps to a shuffled one in O(1) without storing the order.
+def _round_keys(seed):
+    rng = random.Random(seed)
+    return [rng.getrandbits(32) for _ in range(FEISTEL_ROUNDS)]
+
+def _half_bits(size):
+    bits = max((size - 1).bit_length(), 2)
+    return (bits + 1) // 2
+
+def _mix(value, key, mask):
+    value = ((value ^ key) * 0x45D9F3B) & 0xFFFFFFFF
+    value ^= value >> 16
+    return value & mask
+
+def _feistel(value, keys, half, reverse=False):
+    mask = (1 << half) - 1
+    left, right = value >> half, value & mask
+    if not reverse:
+        for key in keys:
+            left, right = right, left ^ _mix(right, key, mask)
+    else:
+        for key in reversed(keys):
+            left, right = right ^ _mix(left, key, mask), left
+    return (left << half) | right
+
+def permuted_position(seed, position, size):
+    """Bank position of the question shown at `position` in this user's shuffled order"""
+    if size <= 1: return 0
+    keys, half = _round_keys(seed), _half_bits(size)
+    value = _feistel(position, keys, half)
+    while value >= size:
+        value = _feistel(value, keys, half)
+    return value
+
+def original_position(seed, bank_position, size):
+    """Inverse of permuted_position"""
+    if size <= 1: return 0
+    keys, half = _round_keys(seed), _half_bits(size)
+    value = _feistel(bank_position, keys, half, reverse=True)
+    while value >= size:
+        value = _feistel(value, keys, half, reverse=True)
+    return value
+
+
+# --- Answered positions (shuffled positions as [start, end) ranges, varint + base64) ---
+# Answering in order keeps a single range, so the size depends on how scattered the
+# answers are, not on how far into the bank they reach. Past QUIZ_ANSWERED_MAX_RUNS the two
+# closest ranges are merged to keep the cookie bounded. The completed count is kept
+# separately, so a merge never inflates it; questions inside a merged gap just won't add
+# to it later.
+def _encode_varints(values):
+    out = bytearray()
+    for value in values:
+        while value >= 0x80:
+            out.append(value & 0x7F | 0x80)
+            value >>= 7
+        out.append(value)
+    return bytes(out)
+
+def _decode_varints(data):
+    values, value, shift = [], 0, 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            values.append(value)
+            value, shift = 0, 0
+    return values
+
+def _load_runs(state):
+    # Stored as gap-before-run, run-length pairs
+    runs, position = [], 0
+    values = _decode_varints(base64.b64decode(state.get('answered_runs') or ''))
+    for gap, length in zip(values[::2], values[1::2]):
+        runs.append([position + gap, position + gap + length])
+        position += gap + length
+    return runs
+
+def _store_runs(state, runs):
+    values, position = [], 0
+    for start, end in runs:
+        values += [start - position, end - start]
+        position = end
+    state['answered_runs'] = base64.b64encode(_encode_varints(values)).decode('ascii')
+
+def _limit_runs(runs):
+    while len(runs) > max(1, QUIZ_ANSWERED_MAX_RUNS):
+        i = min(range(len(runs) - 1), key=lambda k: runs[k + 1][0] - runs[k][1])
+        runs[i:i + 2] = [[runs[i][0], runs[i + 1][1]]]
+    return runs
+
+def is_answered(state, position):
+    runs = _load_runs(state)
+    i = bisect.bisect_right(runs, [position, float('inf')]) - 1
+    return i >= 0 and runs[i][0] <= position < runs[i][1]
+
+def mark_answered(state, position):
+    """Records an answered position; returns True if it wasn't recorded before"""
+    runs = _load_runs(state)
+    i = bisect.bisect_right(runs, [position, float('inf')]) - 1
+    if i >= 0 and runs[i][0] <= position < runs[i][1]: return False
+    joins_left = i >= 0 and runs[i][1] == position
+    joins_right = i + 1 < len(runs) and runs[i + 1][0] == position + 1
+    if joins_left and joins_right:
+        runs[i:i + 2] = [[runs[i][0], runs[i + 1][1]]]
+    elif joins_left:
+        runs[i][1] += 1
+    elif joins_right:
+        runs[i + 1][0] -= 1
+    else:
+        runs.insert(i + 1, [position, position + 1])
+    state['completed'] = answered_count(state) + 1
+    _store_runs(state, _limit_runs(runs))
+    return True
+
+def answered_count(state):
+    return state.get('completed', 0)
+
+# --- END OF FILE quiz_state.py ---
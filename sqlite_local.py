@@ -0,0 +1,27 @@
+# --- START OF FILE sqlite_local.py ---
+# Thread-local SQLite connections for the stores every worker on a host shares (verdict
+# cache, admission buckets, progress, help cache). Each thread gets its own autocommit
+# connection in WAL mode, so readers never block the writer.
+
+import sqlite3
+import threading
+
+
+class LocalConnection:
+    """Call it to get this thread's connection to `path`, opened on first use"""
+
+    def __init__(self, path, timeout=5):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def __call__(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+# --- END OF FILE sqlite_local.py ---
@@ -356,6 +356,47 @@ document.addEventListener('DOMContentLoaded', () => {
          }
      };
 
+    // Streams the help reply over Server-Sent Events, calling onText for each chunk.
+    // Returns false (without calling onText) if streaming isn't available, so the caller can fall back.
+    const streamHelp = async (requestBody, onText) => {
+        if (!window.ReadableStream || !window.TextDecoder) return false;
+        const response = await fetch('/api/ask_chatbot/stream', {
+            method: 'POST', headers: { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' },
+            body: requestBody
+        });
+        if (!response.ok) {
+            const data = await response.json().catch(() => ({}));
+            throw new Error(data.error || `HTTP error ${response.status}: ${response.statusText}`);
+        }
+        if (!response.body) return false;
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            // SSE frames are separated by a blank line
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const frame = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                let eventName = 'message';
+                let dataLine = '';
+                frame.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) eventName = line.slice(6).trim();
+                    else if (line.startsWith('data:')) dataLine += line.slice(5).trim();
+                });
+                const payload = dataLine ? JSON.parse(dataLine) : {};
+                if (eventName === 'error') throw new Error(payload.error || 'Streaming failed.');
+                if (eventName === 'done') return true;
+                if (payload.text) onText(payload.text);
+            }
+        }
+        return true;
+    };
+
     const askForHelp = async () => {
         // Check if help controls are enabled and we have a question context
         if (!helpQuestionInputElement || !askChatbotButton || helpQuestionInputElement.disabled) return;
@@ -375,12 +416,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
 
          try {
-             const data = await apiRequest('/api/ask_chatbot', {
-                 method: 'POST', headers: { 'Content-Type': 'application/json' },
-                 body: JSON.stringify({ question_id: currentQuestionId, help_question: helpQuestion })
-             });
-
-             // Display the help response in a distinct block
+             // Display the help response in a distinct block, filled in as the reply streams in
              const helpResponseContainer = document.createElement('div');
              helpResponseContainer.classList.add(
                  'mt-4', 'pt-4', 'border-t', 'border-md-dark-divider', // Separator line
@@ -389,17 +425,33 @@ document.addEventListener('DOMContentLoaded', () => {
              );
              helpResponseContainer.innerHTML = `
                  <strong class="text-md-dark-primary block mb-2">AI Helper Response:</strong>
-                 <p class="text-md-dark-text-secondary leading-relaxed">${data.chatbot_response || 'No response received.'}</p>
+                 <p class="text-md-dark-text-secondary leading-relaxed"></p>
              `;
-
-             // Append the new container to the main feedback area
-             if (chatbotOutputElement) {
-                 chatbotOutputElement.appendChild(helpResponseContainer);
-                 // Optionally scroll to the bottom of the feedback area
-                 chatbotOutputElement.scrollTop = chatbotOutputElement.scrollHeight;
+             const responseParagraph = helpResponseContainer.querySelector('p');
+             const requestBody = JSON.stringify({ question_id: currentQuestionId, help_question: helpQuestion });
+
+             let appended = false;
+             const appendText = (text) => {
+                 if (!appended && chatbotOutputElement) {
+                     chatbotOutputElement.appendChild(helpResponseContainer);
+                     appended = true;
+                 }
+                 responseParagraph.textContent += text;
+                 // Keep the newest text in view
+                 if (chatbotOutputElement) chatbotOutputElement.scrollTop = chatbotOutputElement.scrollHeight;
+             };
+
+             const streamed = await streamHelp(requestBody, appendText);
+             if (!streamed) {
+                 // Fallback for browsers/proxies without streaming support
+                 const data = await apiRequest('/api/ask_chatbot', {
+                     method: 'POST', headers: { 'Content-Type': 'application/json' }, body: requestBody
+                 });
+                 appendText(data.chatbot_response || 'No response received.');
+             } else if (!responseParagraph.textContent) {
+                 appendText('No response received.');
              }
 
-
          } catch (error) {
              console.error('Error asking for help:', error);
              // Display error distinctly, maybe temporarily replacing main feedback
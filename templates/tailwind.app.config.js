@@ -0,0 +1,60 @@
+// tailwind.app.config.js
+// Theme for the quiz and game pages; compiled to static/dist/app.*.css by build_assets.py.
+// Class names added from JavaScript are picked up from static/*.js.
+module.exports = {
+    darkMode: 'class',
+    content: [
+        "./templates/quiz.html",
+        "./templates/guess_prompt_game.html",
+        "./static/*.js"
+    ],
+    theme: {
+        extend: {
+            animation: {
+                'fade-in': 'fadeIn 0.5s ease-out',
+                'slide-in-up': 'slideInUp 0.5s ease-out forwards' // forwards keeps the end state
+            },
+            keyframes: {
+                fadeIn: { '0%': { opacity: '0' }, '100%': { opacity: '1' }, },
+                slideInUp: { '0%': { transform: 'translateY(20px)', opacity: '0' }, '100%': { transform: 'translateY(0)', opacity: '1' }, }
+            },
+            colors: {
+                // Material Design Dark Theme Inspired Colors
+                'md-dark-bg': '#121212',
+                'md-dark-surface': '#1e1e1e',
+                'md-dark-primary': '#bb86fc',
+                'md-dark-secondary': '#03dac6',
+                'md-dark-error': '#cf6679',
+                'md-dark-text-primary': 'rgba(255, 255, 255, 0.87)',
+                'md-dark-text-secondary': 'rgba(255, 255, 255, 0.6)',
+                'md-dark-on-primary': '#000000',
+                'md-dark-on-secondary': '#000000',
+                'md-dark-on-surface': 'rgba(255, 255, 255, 0.87)',
+                'md-dark-divider': 'rgba(255, 255, 255, 0.12)',
+                // Feedback specific colors
+                'feedback-correct-bg': 'rgba(3, 218, 198, 0.1)',
+                'feedback-correct-border': '#03dac6',
+                'feedback-incorrect-bg': 'rgba(207, 102, 121, 0.1)',
+                'feedback-incorrect-border': '#cf6679',
+                'feedback-neutral-bg': 'rgba(255, 255, 255, 0.05)',
+                'feedback-neutral-border': 'rgba(255, 255, 255, 0.12)',
+                // Game similarity feedback colors
+                'game-very-similar-bg': 'rgba(76, 175, 80, 0.1)', // Green tint
+                'game-very-similar-border': '#4CAF50', // Green
+                'game-somewhat-similar-bg': 'rgba(255, 193, 7, 0.1)', // Yellow tint
+                'game-somewhat-similar-border': '#FFC107', // Yellow
+                'game-not-similar-bg': 'rgba(244, 67, 54, 0.1)', // Red tint
+                'game-not-similar-border': '#F44336', // Red
+            },
+            boxShadow: {
+                'md-elevation-1': '0 1px 3px rgba(0,0,0,0.12), 0 1px 2px rgba(0,0,0,0.24)',
+                'md-elevation-2': '0 3px 6px rgba(0,0,0,0.16), 0 3px 6px rgba(0,0,0,0.23)',
+            },
+            minHeight: {
+                '50px': '50px',
+                '100px': '100px',
+            }
+        },
+    },
+    plugins: [],
+}
@@ -1,9 +1,10 @@
 // tailwind.config.js
+// Theme for the menu page; compiled to static/dist/menu.*.css by build_assets.py.
+// The quiz and game pages use tailwind.app.config.js.
 module.exports = {
     darkMode: 'class',
     content: [
-        "./templates/**/*.html",
-        "./static/**/*.js"
+        "./templates/index.html"
     ],
     theme: {
         extend: {
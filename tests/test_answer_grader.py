@@ -0,0 +1,53 @@
+import json
+import os
+
+import pytest
+
+from answer_grader import AnswerGrader
+
+BANK_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'questions.jsonl')
+
+with open(BANK_PATH, encoding='utf-8') as f:
+    QUESTIONS = {q["id"]: q for q in map(json.loads, f)}
+
+
+@pytest.fixture
+def grader():
+    return AnswerGrader()
+
+@pytest.mark.parametrize("question_id, answer", [
+    (3, "no bias"),
+    (3, "not bias"),
+    (10, "not singularity"),
+    (9, "not explainable"),
+    (6, "Machine Learning is not it"),
+    (7, "DALL-E is wrong"),
+    (1, "Reduced Productivity"),
+    (1, "decreased efficiency"),
+    (6, "not Machine Learning"),
+    (9, "Unexplainable AI"),
+    (5, "GenCat"),
+])
+def test_changed_meaning_is_never_accepted_locally(grader, question_id, answer):
+    result = grader.grade(QUESTIONS[question_id], answer)
+    assert result is None or result[0] is False
+
+@pytest.mark.parametrize("question_id, answer", [
+    (3, "Bias"),
+    (3, "it is bias"),
+    (7, "dall e"),
+    (1, "productivity"),
+    (1, "Productivity Enhanced"),
+    (10, "Singularty"),
+    (9, "Explainabel AI"),
+    (6, "Machine Lerning"),
+])
+def test_obviously_equal_answers_are_accepted(grader, question_id, answer):
+    assert grader.grade(QUESTIONS[question_id], answer)[0] is True
+
+def test_typo_feedback_names_the_correct_spelling(grader):
+    assert grader.grade(QUESTIONS[10], "Singularty") == (True, "Correct [spelling error, Correct spelling: 'Singularity']")
+
+def test_unrelated_answer_is_clearly_wrong(grader):
+    is_correct, feedback = grader.grade(QUESTIONS[3], "Quantum computing")
+    assert is_correct is False and feedback.startswith("Incorrect. The correct answer is: 'Bias'.")
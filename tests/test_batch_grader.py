@@ -0,0 +1,93 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+import batch_grader
+from batch_grader import MicroBatcher
+from model_calls import ModelTimeoutError
+
+
+def question(n):
+    return {"id": n, "question": f"Question {n}?", "answer": f"Answer {n}"}
+
+class FakeGrader:
+    """Replaces call_model: answers in reverse order, omits "skip" answers and fails batches containing "boom" """
+
+    def __init__(self, hold=None):
+        self.batches = []
+        self.timeouts = []
+        self.hold = hold
+
+    def __call__(self, model, prompt, timeout=None):
+        items = json.loads(prompt)
+        self.batches.append([item["user_answer"] for item in items])
+        self.timeouts.append(timeout)
+        if self.hold: self.hold.wait(5)
+        if any(item["user_answer"] == "boom" for item in items): raise ConnectionError("upstream reset")
+        verdicts = [{"item": item["item"], "verdict": "correct" if item["user_answer"] == item["correct_answer"] else "incorrect"}
+                    for item in items if item["user_answer"] != "skip"]
+        return SimpleNamespace(text=json.dumps(verdicts[::-1]))
+
+@pytest.fixture
+def grader(monkeypatch):
+    fake = FakeGrader()
+    monkeypatch.setattr(batch_grader, "call_model", fake)
+    return fake
+
+
+def test_verdicts_reach_their_own_waiters_when_reordered_or_omitted(grader):
+    batcher = MicroBatcher(model=None, window_ms=10_000, max_items=3)
+    futures = [batcher.submit(question(1), "Answer 1"), batcher.submit(question(2), "wrong"),
+               batcher.submit(question(3), "skip")]
+    results = [future.result(timeout=5) for future in futures]
+    assert grader.batches == [["Answer 1", "wrong", "skip"]]
+    assert results[0] == (True, "Correct!", True)
+    assert results[1][0] is False and "'Answer 2'" in results[1][1] and results[1][2]
+    # An omitted item is graded incorrect but not cached
+    assert results[2][0] is False and "'Answer 3'" in results[2][1] and results[2][2] is False
+
+def test_a_failed_batch_fails_only_its_own_futures(grader):
+    batcher = MicroBatcher(model=None, window_ms=10_000, max_items=2)
+    failing = [batcher.submit(question(1), "boom"), batcher.submit(question(2), "Answer 2")]
+    passing = [batcher.submit(question(3), "Answer 3"), batcher.submit(question(4), "nope")]
+    for future in failing:
+        with pytest.raises(ConnectionError): future.result(timeout=5)
+    assert [future.result(timeout=5)[0] for future in passing] == [True, False]
+
+def test_window_flush_grades_a_partial_batch(grader):
+    batcher = MicroBatcher(model=None, window_ms=20, max_items=10)
+    assert batcher.grade(question(1), "Answer 1") == (True, "Correct!", True)
+    assert grader.batches == [["Answer 1"]]
+
+def test_abandoned_batch_is_not_sent(monkeypatch):
+    release = threading.Event()
+    fake = FakeGrader(hold=release)
+    monkeypatch.setattr(batch_grader, "call_model", fake)
+    batcher = MicroBatcher(model=None, window_ms=10_000, max_items=1)
+    batcher._executor = ThreadPoolExecutor(max_workers=1)
+    busy = batcher.submit(question(1), "Answer 1")
+    batcher.wait = 0.2
+    with pytest.raises(ModelTimeoutError):
+        batcher.grade(question(2), "Answer 2")  # queued behind the busy batch, gives up
+    release.set()
+    assert busy.result(timeout=5)[0] is True
+    batcher._executor.shutdown(wait=True)
+    assert fake.batches == [["Answer 1"]]
+
+def test_queue_wait_counts_against_the_deadline(monkeypatch):
+    release = threading.Event()
+    fake = FakeGrader(hold=release)
+    monkeypatch.setattr(batch_grader, "call_model", fake)
+    batcher = MicroBatcher(model=None, window_ms=10_000, max_items=1)
+    batcher._executor = ThreadPoolExecutor(max_workers=1)
+    busy = batcher.submit(question(1), "Answer 1")
+    batcher.wait = batch_grader.MODEL_SLOT_WAIT_SECONDS + 0.2
+    queued = batcher.submit(question(2), "Answer 2")
+    threading.Timer(0.4, release.set).start()
+    with pytest.raises(ModelTimeoutError): queued.result(timeout=5)
+    assert busy.result(timeout=5)[0] is True
+    assert fake.batches == [["Answer 1"]]
+    assert fake.timeouts[0] <= batch_grader.MODEL_CALL_TIMEOUT_SECONDS
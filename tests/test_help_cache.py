@@ -0,0 +1,58 @@
+from help_cache import HelpCache
+
+QUESTION = {"id": 7, "question": "What is a GAN?", "answer": "Generative Adversarial Network", "aliases": ["GAN"]}
+
+
+def cache_at(tmp_path, **kwargs):
+    return HelpCache(path=str(tmp_path / "help.sqlite3"), threshold=0.8, **kwargs)
+
+
+def test_paraphrase_hits_and_negation_misses(tmp_path):
+    cache = cache_at(tmp_path)
+    cache.store(QUESTION, "what does this mean?", "It asks what the acronym stands for.")
+    cache.store(QUESTION, "is it related to transformers", "Only loosely.")
+    cache.store(QUESTION, "should I use generative models here", "Yes, that is the point.")
+    assert cache.lookup(QUESTION, "What does this question mean?") == "It asks what the acronym stands for."
+    assert cache.lookup(QUESTION, "is it related to transformers?") == "Only loosely."
+    assert cache.lookup(QUESTION, "is it not related to transformers") is None
+    assert cache.lookup(QUESTION, "isn't it related to transformers") is None
+    assert cache.lookup(QUESTION, "should I avoid generative models here") is None
+    assert cache.lookup(QUESTION, "how are the two networks trained?") is None
+
+def test_changed_question_does_not_reuse_replies(tmp_path):
+    cache = cache_at(tmp_path)
+    cache.store(QUESTION, "what does this mean?", "Old reply.")
+    fixed = dict(QUESTION, answer="Generative adversarial network (GAN)")
+    assert cache.lookup(fixed, "what does this mean?") is None
+    cache.store(fixed, "what does this mean?", "New reply.")
+    assert cache_at(tmp_path).lookup(QUESTION, "what does this mean?") is None
+
+def test_least_recently_used_reply_is_evicted(tmp_path):
+    cache = cache_at(tmp_path, max_per_question=2)
+    assert cache.lookup(QUESTION, "what is backpropagation") is None  # builds the in-memory index
+    cache.store(QUESTION, "what is backpropagation", "A")
+    cache.store(QUESTION, "give an example of overfitting", "B")
+    assert cache.lookup(QUESTION, "what is backpropagation") == "A"  # now more recent than B
+    cache.store(QUESTION, "why do gradients vanish", "C")
+    assert cache.lookup(QUESTION, "give an example of overfitting") is None
+    assert cache.lookup(QUESTION, "what is backpropagation") == "A"
+    assert cache.lookup(QUESTION, "why do gradients vanish") == "C"
+
+def test_questions_beyond_the_limit_are_dropped_from_memory(tmp_path):
+    cache = cache_at(tmp_path, max_questions=1)
+    cache.lookup(QUESTION, "hello")
+    cache.lookup(dict(QUESTION, id=8), "hello")
+    assert cache.stats()["questions_indexed"] == 1
+
+def test_pinned_replies_survive_eviction(tmp_path):
+    cache = cache_at(tmp_path, max_per_question=1)
+    assert cache.seed([{"question_id": 7, "help_question": "what does this mean?", "response": "Pinned."},
+                       {"question_id": 99, "help_question": "unknown question", "response": "Skipped."}],
+                      {7: QUESTION}.get) == 1
+    cache.lookup(QUESTION, "warm up the index")
+    for text in ("what is backpropagation", "give an example of overfitting", "why do gradients vanish"):
+        cache.store(QUESTION, text, text.upper())
+    assert cache.lookup(QUESTION, "what does this question mean") == "Pinned."
+    assert cache.lookup(QUESTION, "what is backpropagation") is None
+    # The table trim keeps pinned rows too, so a fresh worker still sees it
+    assert cache_at(tmp_path, max_per_question=1).lookup(QUESTION, "what does this mean?") == "Pinned."
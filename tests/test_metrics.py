@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture
+def metrics_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    monkeypatch.setattr(metrics, "_counters", {})
+    monkeypatch.setattr(metrics, "_histograms", {})
+    return tmp_path
+
+def write_worker(directory, pid, requests):
+    snapshot = {"counters": [["http_requests_total", [["route", "/"]], requests]],
+                "histograms": [["http_request_duration_seconds", [["route", "/"]], [1] * (len(metrics.LATENCY_BUCKETS) + 1) + [0.5]]]}
+    (directory / f"{pid}.json").write_text(json.dumps(snapshot))
+
+def requests_total():
+    counters, _ = metrics._merged()
+    return counters.get(("http_requests_total", (("route", "/"),)), 0)
+
+
+def test_dead_worker_counts_are_folded_not_lost_or_repeated(metrics_dir):
+    write_worker(metrics_dir, 101, 5)
+    write_worker(metrics_dir, 102, 7)
+    metrics.mark_process_dead(101)
+    assert not (metrics_dir / "101.json").exists()
+    assert requests_total() == 12
+
+    # A new worker reusing pid 101 starts from zero; the dead worker's 5 stay counted once
+    write_worker(metrics_dir, 101, 1)
+    metrics.mark_process_dead(102)
+    assert requests_total() == 13
+    _, histograms = metrics._merged()
+    assert histograms[("http_request_duration_seconds", (("route", "/"),))][-2] == 3
+
+def test_clear_removes_previous_runs(metrics_dir):
+    write_worker(metrics_dir, 101, 5)
+    metrics.mark_process_dead(101)
+    write_worker(metrics_dir, 102, 7)
+    metrics.clear()
+    assert list(metrics_dir.iterdir()) == []
+    assert requests_total() == 0
+
+def test_unknown_pid_is_ignored(metrics_dir):
+    metrics.mark_process_dead(999)
+    assert list(metrics_dir.iterdir()) == []
@@ -0,0 +1,87 @@
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+import model_client
+from model_client import CircuitBreaker, ModelClient
+
+
+class FakeModel:
+    """Stands in for a GenerativeModel: each call pops the next outcome (an exception or a response)"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if self.outcomes else "ok"
+        if isinstance(outcome, Exception): raise outcome
+        return outcome
+
+def client_with(model):
+    client = ModelClient("test", ["primary"], api_key="unused")
+    client._models["primary"] = model
+    return client
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(model_client, "RETRY_BASE_DELAY_SECONDS", 0)
+
+
+def test_breaker_opens_then_probes_then_closes(monkeypatch):
+    breaker = CircuitBreaker()
+    for _ in range(model_client.BREAKER_MIN_CALLS):
+        assert breaker.allow()
+        breaker.record(False, 0.1)
+    assert breaker.state == "open" and not breaker.allow()
+
+    monkeypatch.setattr(model_client, "BREAKER_COOLDOWN_SECONDS", 0)
+    assert breaker.allow() and breaker.state == "half_open"
+    assert not breaker.allow()  # only one probe at a time
+    breaker.record(False, 0.1)
+    assert breaker.state == "open"
+
+    assert breaker.allow()
+    breaker.record(True, 0.1)
+    assert breaker.state == "closed" and breaker.error_rate() == 0.0
+
+def test_retries_spend_the_budget_and_stop_when_it_runs_out(monkeypatch):
+    monkeypatch.setattr(model_client, "RETRY_MAX_ATTEMPTS", 3)
+    model = FakeModel(*[google_exceptions.ServiceUnavailable("down")] * 3)
+    client = client_with(model)
+    client.retry_budget = 1.5
+    with pytest.raises(google_exceptions.ServiceUnavailable):
+        client.generate_content("hi")
+    # +RETRY_BUDGET_RATIO for the request, -1 for the single retry it could afford
+    assert model.calls == 2
+    assert client.retry_budget == pytest.approx(1.5 + model_client.RETRY_BUDGET_RATIO - 1)
+
+def test_retry_succeeds_within_budget():
+    model = FakeModel(google_exceptions.ServiceUnavailable("down"), "ok")
+    client = client_with(model)
+    assert client.generate_content("hi") == "ok"
+    assert client.retry_budget == pytest.approx(model_client.RETRY_BUDGET_MAX - 1)
+
+def test_zero_max_attempts_still_makes_one_call(monkeypatch):
+    monkeypatch.setattr(model_client, "RETRY_MAX_ATTEMPTS", 0)
+    model = FakeModel(google_exceptions.ServiceUnavailable("down"))
+    with pytest.raises(google_exceptions.ServiceUnavailable):
+        client_with(model).generate_content("hi")
+    assert model.calls == 1
+
+def test_stream_outcome_is_recorded_when_the_stream_ends():
+    def broken_stream():
+        yield "first"
+        raise google_exceptions.ServiceUnavailable("connection reset")
+    client = client_with(FakeModel(broken_stream(), iter(["a", "b"])))
+    breaker = client.breakers["primary"]
+
+    stream = client.generate_content("hi", stream=True)
+    assert next(stream) == "first"
+    assert breaker.total_calls == 0
+    with pytest.raises(google_exceptions.ServiceUnavailable):
+        next(stream)
+    assert (breaker.total_calls, breaker.total_failures) == (1, 1)
+
+    assert list(client.generate_content("hi", stream=True)) == ["a", "b"]
+    assert (breaker.total_calls, breaker.total_failures) == (2, 1)
@@ -0,0 +1,26 @@
+from progress_store import ProgressStore
+
+
+def store_at(tmp_path, **kwargs):
+    return ProgressStore(path=str(tmp_path / "progress.sqlite3"), **kwargs)
+
+def record(store, *attempts):
+    for user_id, question_id, is_correct in attempts:
+        store.record_attempt(user_id, question_id, is_correct)
+    store.flush()
+    store.refresh()
+
+def test_repeating_a_correct_answer_scores_once(tmp_path):
+    store = store_at(tmp_path)
+    record(store, *[("repeat", 1, True)] * 5, ("repeat", 2, False), ("repeat", 2, True))
+    # Score counts distinct solved questions; accuracy counts every correct attempt
+    assert store.user_stats("repeat") == {"attempts": 7, "correct": 2, "accuracy": 0.857}
+    assert store.leaderboard()[0] == {"rank": 1, "user_id": "repeat", "correct": 2, "attempts": 7, "accuracy": 0.857}
+
+def test_top_list_refills_when_a_kept_user_falls(tmp_path):
+    store = store_at(tmp_path, leaderboard_size=2)
+    record(store, ("a", 1, True), ("b", 1, True), ("c", 1, True), ("c", 2, False))
+    assert [row["user_id"] for row in store.leaderboard()] == ["a", "b"]
+    # "b" needs more attempts for the same score, so "c" (never kept) now outranks "b"
+    record(store, ("b", 2, False), ("b", 3, False))
+    assert [row["user_id"] for row in store.leaderboard()] == ["a", "c"]
@@ -0,0 +1,58 @@
+import json
+import math
+import os
+
+import pytest
+
+import prompt_similarity as ps
+from prompt_similarity import PromptSimilarity, calibrate
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "prompt_guesses_labelled.jsonl")
+PROMPTS = {"g1": "Write a short poem about a robot learning to dream.",
+           "g2": "Describe a futuristic city powered entirely by bioluminescent algae."}
+
+
+def test_score_batch_matches_single_scores_and_marks_unknown_ids():
+    engine = PromptSimilarity(PROMPTS)
+    pairs = [("g1", "poem about a robot that dreams"), ("missing", "anything"), (["g1"], "unhashable id"),
+             ("g2", "a future city that runs on glowing algae")]
+    scores = engine.score_batch(pairs)
+    assert scores.shape == (4,)
+    assert math.isnan(scores[1]) and math.isnan(scores[2])
+    assert scores[0] == pytest.approx(engine.score(*pairs[0]))
+    assert scores[3] == pytest.approx(engine.score(*pairs[3]))
+    assert engine.score("g1", PROMPTS["g1"]) == pytest.approx(1.0)
+    assert engine.score_batch([]).shape == (0,)
+
+def test_rate_flags_scores_near_either_threshold():
+    engine = PromptSimilarity(PROMPTS, very=0.5, somewhat=0.2, margin=0.05)
+    assert engine.rate(0.9) == ("Very Similar", False)
+    assert engine.rate(0.52) == ("Very Similar", True)
+    assert engine.rate(0.47) == ("Somewhat Similar", True)
+    assert engine.rate(0.35) == ("Somewhat Similar", False)
+    assert engine.rate(0.18) == ("Not Similar", True)
+    assert engine.rate(0.0) == ("Not Similar", False)
+
+def test_reported_guesses_are_not_decided_locally_as_somewhat():
+    engine = PromptSimilarity(PROMPTS)
+    rating, borderline = engine.rate(engine.score("g1", "poem about a robot that dreams"))
+    assert rating == "Very Similar" or borderline
+    assert engine.rate(engine.score("g1", "write a poem"))[1]
+
+def test_calibrate_recovers_separable_thresholds():
+    scores = [0.9, 0.7, 0.62, 0.5, 0.4, 0.31, 0.2, 0.1, 0.0]
+    labels = ["Very Similar"] * 3 + ["Somewhat Similar"] * 3 + ["Not Similar"] * 3
+    very, somewhat, accuracy = calibrate(scores, labels)
+    assert accuracy == 1.0
+    assert 0.5 < very <= 0.62 and 0.2 < somewhat <= 0.31
+
+def test_defaults_match_calibration_on_the_labelled_sample():
+    with open(SAMPLE, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    engine = PromptSimilarity({row["original_prompt"]: row["original_prompt"] for row in rows})
+    scores = engine.score_batch([(row["original_prompt"], row["user_guess"]) for row in rows])
+    labels = [row["similarity"] for row in rows]
+    very, _, best = calibrate(scores, labels)
+    assert very == ps.PROMPT_SIM_VERY
+    defaults = [engine.rate(score)[0] for score in scores]
+    assert sum(rating == label for rating, label in zip(defaults, labels)) / len(labels) == pytest.approx(best)
@@ -0,0 +1,38 @@
+import json
+import os
+
+from question_bank import QuestionBank
+
+
+def write_bank(path, ids, atomic=True):
+    lines = "".join(json.dumps({"id": i, "question": f"Question {i}?", "answer": f"Answer {i}"}) + "\n" for i in ids)
+    target = str(path) + ".tmp" if atomic else str(path)
+    with open(target, "w", encoding="utf-8") as f:
+        f.write(lines)
+    if atomic: os.replace(target, path)
+
+def test_atomic_replace_is_picked_up(tmp_path):
+    path = tmp_path / "questions.jsonl"
+    write_bank(path, [1, 2, 3])
+    bank = QuestionBank(str(path), reload_seconds=0.001)
+    assert bank.get(2)["answer"] == "Answer 2"
+    write_bank(path, [1, 2, 3, 4])
+    bank._next_check = 0
+    assert len(bank) == 4 and bank.get(4)["answer"] == "Answer 4"
+
+def test_in_place_truncation_does_not_break_reads(tmp_path):
+    path = tmp_path / "questions.jsonl"
+    write_bank(path, range(1, 50))
+    bank = QuestionBank(str(path), reload_seconds=3600)
+    with open(path, "r+b") as f:
+        f.truncate(10)
+    assert bank.get(40) is None
+    write_bank(path, [7, 8], atomic=False)
+    assert bank.get(8)["answer"] == "Answer 8" and len(bank) == 2
+
+def test_in_place_edit_that_shifts_records_reloads(tmp_path):
+    path = tmp_path / "questions.jsonl"
+    write_bank(path, [1, 2, 3])
+    bank = QuestionBank(str(path), reload_seconds=3600)
+    write_bank(path, [10, 2, 3], atomic=False)
+    assert bank.question_in_pool(0)["id"] == 10
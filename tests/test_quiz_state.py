@@ -0,0 +1,23 @@
+import random
+
+import quiz_state as qs
+
+
+def test_far_position_keeps_state_small():
+    state = qs.new_quiz_state()
+    qs.mark_answered(state, 100_000)
+    assert len(state['answered_runs']) < 16
+    assert qs.is_answered(state, 100_000) and not qs.is_answered(state, 99_999)
+
+def test_scattered_answers_stay_bounded_and_are_never_over_counted():
+    state = qs.new_quiz_state()
+    positions = random.Random(7).sample(range(100_000), 500)
+    for position in positions:
+        qs.mark_answered(state, position)
+    assert len(state['answered_runs']) <= qs.QUIZ_ANSWERED_MAX_RUNS * 8
+    assert qs.answered_count(state) <= len(positions)
+
+def test_repeat_answers_count_once():
+    state = qs.new_quiz_state()
+    assert [qs.mark_answered(state, p) for p in (3, 4, 3, 2, 4)] == [True, True, False, True, False]
+    assert qs.answered_count(state) == 3
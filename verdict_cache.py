@@ -0,0 +1,142 @@
+# --- START OF FILE verdict_cache.py ---
+
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+import metrics
+from question_bank import question_version
+from sqlite_local import LocalConnection
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+# The cache lives in a local SQLite file so every gunicorn worker on the host shares it.
+VERDICT_CACHE_PATH = os.environ.get('VERDICT_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'quiz_verdicts.sqlite3'))
+VERDICT_CACHE_MAX_ENTRIES = int(os.environ.get('VERDICT_CACHE_MAX_ENTRIES', 5000))
+VERDICT_CACHE_TTL_SECONDS = int(os.environ.get('VERDICT_CACHE_TTL_SECONDS', 24 * 60 * 60))
+
+
+def normalize_answer(text):
+    """Normalizes a user answer for cache lookups (case, whitespace, surrounding punctuation)"""
+    text = re.sub(r'\s+', ' ', (text or '').casefold()).strip()
+    return text.strip(' .,!?;:\'"')
+
+
+class VerdictCache:
+    """Shared (question, normalized answer) -> verdict store with size and TTL eviction.
+
+    Entries are keyed by the question's id and version (question_bank.question_version),
+    so verdicts graded against an answer that has since been edited are never served.
+
+    Concurrent misses for the same key within a worker are merged: the first caller
+    computes the verdict, the others wait for it instead of issuing their own model call.
+    """
+
+    def __init__(self, path=VERDICT_CACHE_PATH, max_entries=VERDICT_CACHE_MAX_ENTRIES, ttl_seconds=VERDICT_CACHE_TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._connect = LocalConnection(path, timeout=5)
+        self._inflight = {}  # key -> threading.Event
+        self._inflight_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._ensure_schema()
+
+    def _ensure_schema(self):
+        self._connect().execute(
+            'CREATE TABLE IF NOT EXISTS verdicts ('
+            ' question_id INTEGER NOT NULL, version TEXT NOT NULL, answer TEXT NOT NULL,'
+            ' is_correct INTEGER NOT NULL, feedback TEXT NOT NULL, created_at REAL NOT NULL,'
+            ' PRIMARY KEY (question_id, version, answer))'
+        )
+        self._connect().execute('CREATE INDEX IF NOT EXISTS verdicts_created_at ON verdicts (created_at)')
+
+    @staticmethod
+    def _key(question_obj, user_answer):
+        return question_obj["id"], question_version(question_obj), normalize_answer(user_answer)
+
+    def get(self, question_obj, user_answer):
+        """Returns (is_correct, feedback) or None if missing/expired"""
+        try:
+            row = self._connect().execute(
+                'SELECT is_correct, feedback FROM verdicts WHERE question_id = ? AND version = ? AND answer = ? AND created_at >= ?',
+                (*self._key(question_obj, user_answer), time.time() - self.ttl_seconds)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("verdict cache read failed", extra={"error": str(e)})
+            return None
+        if row is None:
+            return None
+        return bool(row[0]), row[1]
+
+    def put(self, question_obj, user_answer, is_correct, feedback):
+        try:
+            conn = self._connect()
+            conn.execute(
+                'INSERT OR REPLACE INTO verdicts (question_id, version, answer, is_correct, feedback, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (*self._key(question_obj, user_answer), int(is_correct), feedback, time.time())
+            )
+            self._evict(conn)
+        except sqlite3.Error as e:
+            logger.warning("verdict cache write failed", extra={"error": str(e)})
+
+    def _evict(self, conn):
+        conn.execute('DELETE FROM verdicts WHERE created_at < ?', (time.time() - self.ttl_seconds,))
+        # Oldest-first trim once the table exceeds its size budget
+        conn.execute(
+            'DELETE FROM verdicts WHERE rowid IN ('
+            ' SELECT rowid FROM verdicts ORDER BY created_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,)
+        )
+
+    def get_or_compute(self, question_obj, user_answer, compute):
+        """Returns a cached verdict, or calls compute() once per key and caches its result.
+
+        compute() must return (is_correct, feedback, cacheable). Uncacheable results
+        (fallback text after an upstream error) are returned but not stored.
+        """
+        key = self._key(question_obj, user_answer)
+        while True:
+            cached = self.get(question_obj, user_answer)
+            if cached is not None:
+                self.hits += 1
+                metrics.inc("verdict_cache_requests_total", result="hit")
+                return cached
+            with self._inflight_lock:
+                event = self._inflight.get(key)
+                if event is None:
+                    event = threading.Event()
+                    self._inflight[key] = event
+                    is_leader = True
+                else:
+                    is_leader = False
+            if is_leader:
+                break
+            # Another request is already asking the model; wait and re-read the cache.
+            event.wait()
+            cached = self.get(question_obj, user_answer)
+            if cached is not None:
+                self.hits += 1
+                metrics.inc("verdict_cache_requests_total", result="hit")
+                return cached
+            # The leader's result was not cacheable; fall through and try ourselves.
+
+        self.misses += 1
+        metrics.inc("verdict_cache_requests_total", result="miss")
+        try:
+            is_correct, feedback, cacheable = compute()
+            if cacheable:
+                self.put(question_obj, user_answer, is_correct, feedback)
+            return is_correct, feedback
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+# --- END OF FILE verdict_cache.py ---